@@ -27,7 +27,7 @@ from .schemas import (
 )
 from .utils.pantry_matcher import match_recipes
 from .utils.rate_limiter import RateLimiter
-from .api.receipts import router as receipts_router
+from .api.receipts import router as receipts_router, hybrid_parser
 from .api.gemini_test import router as gemini_test_router
 
 load_dotenv()
@@ -45,6 +45,7 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     print("FastAPI server shutting down...")
+    hybrid_parser.close()
 
 
 # Create FastAPI app
@@ -5,16 +5,32 @@ Includes confidence scoring, better patterns, and store-specific logic
 """
 
 import re
+import sys
 import hashlib
 import logging
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, replace
 
 logger = logging.getLogger(__name__)
 
+MONTH_NAMES = (
+    'JANUARY', 'FEBRUARY', 'MARCH', 'APRIL', 'MAY', 'JUNE',
+    'JULY', 'AUGUST', 'SEPTEMBER', 'OCTOBER', 'NOVEMBER', 'DECEMBER',
+)
+# Month number by its first three letters
+MONTHS = {name[:3]: number for number, name in enumerate(MONTH_NAMES, 1)}
+# Abbreviated ("JAN", "Jan.", "SEPT") or full ("JANUARY") month names
+_MONTH_ALTERNATION = r'\b(?:' + '|'.join(
+    name[:3] + (f'(?:{name[3:]})?' if name[3:] else '') for name in MONTH_NAMES
+) + r'|SEPT)\.?'
 
-@dataclass
+# Sales tax rates tried when a receipt has no usable subtotal/tax (0% to 10%)
+TYPICAL_TAX_RATES = (0, 0.05, 0.065, 0.07, 0.08, 0.0875, 0.10)
+
+
+@dataclass(slots=True, frozen=True)
 class ParsedItem:
     """A parsed receipt item with confidence"""
     raw_text: str
@@ -30,8 +46,20 @@ class ParsedItem:
         """Get price in dollars"""
         return self.price_cents / 100.0
 
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for API response"""
+        return {
+            'raw_text': self.raw_text,
+            'item_name': self.item_name,
+            'quantity': self.quantity,
+            'unit': self.unit,
+            'price_cents': self.price_cents,
+            'confidence': self.confidence,
+            'category': self.category,
+        }
+
 
-@dataclass
+@dataclass(slots=True)
 class ReceiptData:
     """Complete parsed receipt data"""
     merchant: Optional[str] = None
@@ -76,14 +104,35 @@ class ReceiptData:
     def tax(self) -> float:
         return self.tax_cents / 100.0
 
+    def items_stats(self) -> Tuple[int, int]:
+        """Return (sum of item prices, number of items with a price) in one pass"""
+        return EnhancedHeuristicParser._items_stats(self.items)
+
     def to_dict(self) -> Dict:
         """Convert to dictionary for API response"""
-        data = asdict(self)
-        # Add computed properties
-        data['total'] = self.total
-        data['subtotal'] = self.subtotal
-        data['tax'] = self.tax
-        return data
+        # Built by hand: asdict() deep-copies every field reflectively
+        return {
+            'merchant': self.merchant,
+            'store_id': self.store_id,
+            'date': self.date,
+            'time': self.time,
+            'total_cents': self.total_cents,
+            'subtotal_cents': self.subtotal_cents,
+            'tax_cents': self.tax_cents,
+            'savings_cents': self.savings_cents,
+            'items': [item.to_dict() for item in self.items],
+            'confidence': self.confidence,
+            'reconciliation_ok': self.reconciliation_ok,
+            'lines_paired_ratio': self.lines_paired_ratio,
+            'path_taken': self.path_taken,
+            'content_hash': self.content_hash,
+            'should_use_gemini': self.should_use_gemini,
+            'parsing_errors': list(self.parsing_errors),
+            # Dollar amounts, derived from cents here rather than via the properties
+            'total': self.total_cents / 100.0,
+            'subtotal': self.subtotal_cents / 100.0,
+            'tax': self.tax_cents / 100.0,
+        }
 
 
 class EnhancedHeuristicParser:
@@ -92,90 +141,158 @@ class EnhancedHeuristicParser:
     and store-specific logic
     """
 
-    def __init__(self):
-        # Store-specific patterns
-        self.store_patterns = {
-            'WALMART': {
-                'name_variations': [r'WAL[\s\-]*MART', r'WALMART\s+SUPERCENTER', r'WAL\*MART'],
-                'item_format': 'separate_line',  # Price on next line
-                'tax_marker': r'[XON]$',  # X=taxable, O=non-taxable, N=non-food
-            },
-            'TARGET': {
-                'name_variations': [r'TARGET', r'SUPER\s+TARGET'],
-                'item_format': 'same_line',
-                'tax_marker': r'[TFN]$',  # T=taxable, F=food, N=non-food
-            },
-            'KROGER': {
-                'name_variations': [r'KROGER', r'KING\s+SOOPERS', r'RALPH\'?S', r'FRED\s+MEYER'],
-                'item_format': 'same_line',
-                'member_card': r'VIC\s+CARD\s+SAVINGS',
-            },
-            'COSTCO': {
-                'name_variations': [r'COSTCO', r'COSTCO\s+WHOLESALE'],
-                'item_format': 'code_first',  # Item code before name
-                'bulk_items': True,
-            },
-            'WHOLE_FOODS': {
-                'name_variations': [r'WHOLE\s+FOODS', r'WFM', r'WHOLE\s+FOODS\s+MARKET'],
-                'item_format': 'same_line',
-                'organic_markers': [r'\bORG\b', r'\bORGANIC\b'],
-            },
-        }
-
-        # Enhanced patterns
-        self.price_patterns = {
-            'standard': r'(\d{1,4}\.\d{2})',
-            'with_dash': r'[\-\s]+(\d{1,4}\.\d{2})',
-            'end_of_line': r'(\d{1,4}\.\d{2})\s*[XOTFN]?\s*$',
-            'negative': r'-\s*(\d{1,4}\.\d{2})',
-            'weighted': r'(\d+\.?\d*)\s*(LB|KG|OZ|EA)\s*@\s*\$?(\d+\.?\d*)',
-            'quantity': r'^(\d+)\s+@\s+\$?(\d+\.\d{2})',
-        }
-
-        # Common OCR errors to fix
-        self.ocr_corrections = {
-            r'M[1l]LK': 'MILK',
-            r'CH[K8]N': 'CHICKEN',
-            r'B[0O]X': 'BOX',
-            r'[0O]RANGE': 'ORANGE',
-            r'[0O]RG': 'ORG',
-            r'P[0O]TAT[0O]': 'POTATO',
-            r'T[0O]MAT[0O]': 'TOMATO',
-            r'BANAN[A4]': 'BANANA',
-            r'[4A]PPLE': 'APPLE',
-            r'C[0O]KE': 'COKE',
-            r'PEPS[1I]': 'PEPSI',
-        }
-
-        # Category patterns
-        self.category_patterns = {
-            'dairy': r'\b(MILK|CHEESE|YOGURT|BUTTER|CREAM|COTTAGE|SOUR)\b',
-            'produce': r'\b(APPLE|BANANA|ORANGE|TOMATO|LETTUCE|POTATO|ONION|CARROT)\b',
-            'meat': r'\b(CHICKEN|BEEF|PORK|TURKEY|FISH|SALMON|STEAK|BACON)\b',
-            'bakery': r'\b(BREAD|BAGEL|ROLL|MUFFIN|CAKE|DONUT|CROISSANT)\b',
-            'beverages': r'\b(WATER|SODA|JUICE|COFFEE|TEA|COKE|PEPSI|SPRITE)\b',
-            'frozen': r'\b(FROZEN|ICE\s+CREAM|PIZZA)\b',
-            'snacks': r'\b(CHIPS|CRACKERS|COOKIES|CANDY|NUTS|POPCORN)\b',
+    # Store-specific patterns
+    STORE_PATTERNS = {
+        'WALMART': {
+            'name_variations': [r'WAL[\s\-]*MART', r'WALMART\s+SUPERCENTER', r'WAL\*MART'],
+            'item_format': 'separate_line',  # Price on next line
+            'tax_marker': r'[XON]$',  # X=taxable, O=non-taxable, N=non-food
+        },
+        'TARGET': {
+            'name_variations': [r'TARGET', r'SUPER\s+TARGET'],
+            'item_format': 'same_line',
+            'tax_marker': r'[TFN]$',  # T=taxable, F=food, N=non-food
+        },
+        'KROGER': {
+            'name_variations': [r'KROGER', r'KING\s+SOOPERS', r'RALPH\'?S', r'FRED\s+MEYER'],
+            'item_format': 'same_line',
+            'member_card': r'VIC\s+CARD\s+SAVINGS',
+        },
+        'COSTCO': {
+            'name_variations': [r'COSTCO', r'COSTCO\s+WHOLESALE'],
+            'item_format': 'code_first',  # Item code before name
+            'bulk_items': True,
+        },
+        'WHOLE_FOODS': {
+            'name_variations': [r'WHOLE\s+FOODS', r'WFM', r'WHOLE\s+FOODS\s+MARKET'],
+            'item_format': 'same_line',
+            'organic_markers': [r'\bORG\b', r'\bORGANIC\b'],
+        },
+    }
+
+    # Enhanced patterns
+    PRICE_PATTERNS = {
+        'standard': r'(\d{1,4}\.\d{2})',
+        'with_dash': r'[\-\s]+(\d{1,4}\.\d{2})',
+        'end_of_line': r'(\d{1,4}\.\d{2})\s*[XOTFN]?\s*$',
+        'negative': r'-\s*(\d{1,4}\.\d{2})',
+        'weighted': r'(\d+\.?\d*)\s*(LB|KG|OZ|EA)\s*@\s*\$?(\d+\.?\d*)',
+        'quantity': r'^(\d+)\s+@\s+\$?(\d+\.\d{2})',
+    }
+
+    # Common OCR errors to fix
+    OCR_CORRECTIONS = {
+        r'M[1l]LK': 'MILK',
+        r'CH[K8]N': 'CHICKEN',
+        r'B[0O]X': 'BOX',
+        r'[0O]RANGE': 'ORANGE',
+        r'[0O]RG': 'ORG',
+        r'P[0O]TAT[0O]': 'POTATO',
+        r'T[0O]MAT[0O]': 'TOMATO',
+        r'BANAN[A4]': 'BANANA',
+        r'[4A]PPLE': 'APPLE',
+        r'C[0O]KE': 'COKE',
+        r'PEPS[1I]': 'PEPSI',
+    }
+
+    # Category patterns
+    CATEGORY_PATTERNS = {
+        'dairy': r'\b(MILK|CHEESE|YOGURT|BUTTER|CREAM|COTTAGE|SOUR)\b',
+        'produce': r'\b(APPLE|BANANA|ORANGE|TOMATO|LETTUCE|POTATO|ONION|CARROT)\b',
+        'meat': r'\b(CHICKEN|BEEF|PORK|TURKEY|FISH|SALMON|STEAK|BACON)\b',
+        'bakery': r'\b(BREAD|BAGEL|ROLL|MUFFIN|CAKE|DONUT|CROISSANT)\b',
+        'beverages': r'\b(WATER|SODA|JUICE|COFFEE|TEA|COKE|PEPSI|SPRITE)\b',
+        'frozen': r'\b(FROZEN|ICE\s+CREAM|PIZZA)\b',
+        'snacks': r'\b(CHIPS|CRACKERS|COOKIES|CANDY|NUTS|POPCORN)\b',
+    }
+
+    # Skip patterns - definitely not items
+    SKIP_PATTERNS = [
+        r'TOTAL\s+POINTS',
+        r'REWARDS?\s+BALANCE',
+        r'MEMBER\s+#?\s*\d+',
+        r'CARD\s+#?\s*\d{4}',
+        r'^\*+$',
+        r'^-+$',
+        r'^=+$',
+        r'THANK\s+YOU',
+        r'CUSTOMER\s+COPY',
+        r'STORE\s+#?\d+',
+        r'REG\s+#?\d+',
+        r'CASHIER',
+        r'^\d{10,}$',  # Barcodes
+        r'^\(\d{3}\)\s*\d{3}-\d{4}$',  # Phone numbers
+    ]
+
+    # Compiled once at import time and shared by every parser instance
+    _STORE_NAME_RES = {
+        store_key: [re.compile(pattern) for pattern in info['name_variations']]
+        for store_key, info in STORE_PATTERNS.items()
+    }
+    _PRICE_RES = {name: re.compile(pattern) for name, pattern in PRICE_PATTERNS.items()}
+    _OCR_CORRECTION_RES = [
+        (re.compile(pattern, re.IGNORECASE), replacement)
+        for pattern, replacement in OCR_CORRECTIONS.items()
+    ]
+    _CATEGORY_RES = {category: re.compile(pattern) for category, pattern in CATEGORY_PATTERNS.items()}
+    _SKIP_RES = [re.compile(pattern) for pattern in SKIP_PATTERNS]
+
+    # Lines that mention a total but carry no money amount
+    _TOTALS_SKIP_RE = re.compile(r'TOTAL POINTS|REWARDS|ITEMS')
+
+    # Totals keywords, matched at the start of the line with the alternation
+    # order as the priority. A line's leading keyword decides its type, so
+    # "TOTAL TAX" and "TOTAL SAVINGS" are not the receipt total while
+    # "TOTAL AFTER TAX" and "TOTAL INCL HST" are. Keywords further into a
+    # line ("NEW SUBTOTAL", "CLUB SAVINGS", "T = TAX") are looked for after.
+    _TOTALS_RE = re.compile(
+        r'(?P<subtotal>(?=.*?(?:SUB\s*-?\s*TOTAL|MERCHANDISE)))'
+        r'|(?P<tax>\W*(?:TOTAL\s+)?(?:SALES\s+)?(?:TAX|GST|PST|HST))'
+        r'|(?P<savings>\W*(?:TOTAL\s+)?(?:SAVINGS|YOU\s+SAVED|DISCOUNT))'
+        r'|(?P<total>(?=.*?(?:TOTAL|BALANCE\s+DUE|AMOUNT\s+DUE)))'
+        r'|(?P<other_savings>(?=.*?(?:SAVINGS|YOU\s+SAVED|DISCOUNT)))'
+        r'|(?P<other_tax>(?=.*?(?:TAX|GST|PST|HST)))'
+    )
+
+    # Store number forms, tried in order
+    _STORE_NUMBER_RES = [
+        re.compile(pattern, re.IGNORECASE)
+        for pattern in (
+            r'STORE\s*#?\s*(\d+)',
+            r'ST#?\s*(\d+)',
+            r'UNIT\s*#?\s*(\d+)',
+            r'#(\d{3,5})\s*$',  # Store number at end of line
+        )
+    ]
+
+    _TIME_RE = re.compile(r'(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)', re.IGNORECASE)
+
+    # One scan per line; the named group that closes the match is the format.
+    # Year-first is tried before month-first so "2025-01-15" is not read
+    # as month 25.
+    _DATE_RE = re.compile(
+        r'(?P<ymd>(?P<ymd_y>\d{4})[./-](?P<ymd_m>\d{1,2})[./-](?P<ymd_d>\d{1,2}))'
+        r'|(?P<mdy>(?P<mdy_m>\d{1,2})[/-](?P<mdy_d>\d{1,2})[/-](?P<mdy_y>\d{2,4}))'
+        r'|(?P<mdy_text>(?P<mdy_text_mon>' + _MONTH_ALTERNATION + r')\s+'
+        r'(?P<mdy_text_d>\d{1,2}),?\s+(?P<mdy_text_y>\d{4}))'
+        r'|(?P<dmy_text>(?P<dmy_text_d>\d{1,2})\s+'
+        r'(?P<dmy_text_mon>' + _MONTH_ALTERNATION + r')\s+(?P<dmy_text_y>\d{4}))',
+        re.IGNORECASE,
+    )
+
+    def __init__(self, cache_size: int = 1024):
+        # Recent results keyed by (content_hash, store_hint); mobile clients
+        # resubmit the same OCR text after transient failures
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = cache_size
+
+        # Item parser for each store item_format
+        self.item_parsers = {
+            'same_line': self._parse_standard_format,
+            'separate_line': self._parse_walmart_style,
+            'code_first': self._parse_costco_style,
         }
 
-        # Skip patterns - definitely not items
-        self.skip_patterns = [
-            r'TOTAL\s+POINTS',
-            r'REWARDS?\s+BALANCE',
-            r'MEMBER\s+#?\s*\d+',
-            r'CARD\s+#?\s*\d{4}',
-            r'^\*+$',
-            r'^-+$',
-            r'^=+$',
-            r'THANK\s+YOU',
-            r'CUSTOMER\s+COPY',
-            r'STORE\s+#?\d+',
-            r'REG\s+#?\d+',
-            r'CASHIER',
-            r'^\d{10,}$',  # Barcodes
-            r'^\(\d{3}\)\s*\d{3}-\d{4}$',  # Phone numbers
-        ]
-
     async def parse(self, ocr_text: str, store_hint: Optional[str] = None) -> ReceiptData:
         """
         Parse OCR text into structured receipt data
@@ -187,8 +304,18 @@ class EnhancedHeuristicParser:
         Returns:
             ReceiptData with parsed information
         """
+        return self.parse_sync(ocr_text, store_hint)
+
+    def parse_sync(self, ocr_text: str, store_hint: Optional[str] = None) -> ReceiptData:
+        """Synchronous parse, for running in an executor"""
         # Calculate content hash for idempotency
-        content_hash = hashlib.sha256(ocr_text.encode()).hexdigest()[:16]
+        content_hash = hashlib.blake2b(ocr_text.encode(), digest_size=8).hexdigest()
+
+        cache_key = (content_hash, store_hint)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            return self._copy_result(cached)
 
         # Apply OCR corrections
         corrected_text = self._apply_ocr_corrections(ocr_text)
@@ -199,34 +326,31 @@ class EnhancedHeuristicParser:
         # Detect store
         store_info = self._detect_store(lines[:10], store_hint)
 
-        # Extract metadata
+        # Extract metadata and totals (all as cents) in a single pass
         merchant = store_info.get('name')
-        store_id = self._find_store_number(lines[:15])
-        date = self._find_date(lines)
-        time = self._find_time(lines)
-
-        # Find totals (all as cents)
-        totals = self._find_totals_cents(lines)
+        store_id, date, time, totals = self._scan_lines(lines)
 
         # Parse items based on store format
         items = self._parse_items_by_store(lines, store_info)
 
-        # Calculate metrics
+        # Calculate metrics from a single pass over the items
+        items_sum_cents, items_with_price = self._items_stats(items)
+
         confidence = self._calculate_confidence(
-            merchant, date, totals['total'], items
+            merchant, date, totals['total'], items_with_price
         )
 
-        lines_paired_ratio = self._calculate_pairing_ratio(items)
+        lines_paired_ratio = self._calculate_pairing_ratio(items_with_price, len(items))
 
         reconciliation_ok = self._check_reconciliation(
-            items, totals['subtotal'], totals['tax'], totals['total']
+            len(items), items_sum_cents, totals['subtotal'], totals['tax'], totals['total']
         )
 
         # Determine if Gemini is needed
         should_use_gemini = confidence < 0.7 or not reconciliation_ok
 
         # Build response
-        return ReceiptData(
+        result = ReceiptData(
             merchant=merchant,
             store_id=store_id,
             date=date,
@@ -244,11 +368,57 @@ class EnhancedHeuristicParser:
             path_taken="heuristics"
         )
 
+        # Evict oldest entries if cache is full
+        while len(self._cache) >= self._cache_size:
+            self._cache.popitem(last=False)
+        self._cache[cache_key] = result
+
+        return self._copy_result(result)
+
+    async def parse_batch(
+        self,
+        ocr_texts: List[str],
+        store_hints: Optional[List[Optional[str]]] = None
+    ) -> List[ReceiptData]:
+        """
+        Parse many receipts with this parser's shared patterns and cache
+
+        Args:
+            ocr_texts: Raw OCR text for each receipt
+            store_hints: Optional store hint per receipt, aligned with ocr_texts
+
+        Returns:
+            ReceiptData for each receipt, in input order
+        """
+        if store_hints is None:
+            store_hints = [None] * len(ocr_texts)
+        elif len(store_hints) != len(ocr_texts):
+            raise ValueError("store_hints must be the same length as ocr_texts")
+
+        # Parsing is pure CPU work on the GIL, so receipts run back to back;
+        # duplicates within the batch are served from the result cache
+        return [
+            await self.parse(ocr_text, store_hint)
+            for ocr_text, store_hint in zip(ocr_texts, store_hints)
+        ]
+
+    @staticmethod
+    def _copy_result(result: ReceiptData) -> ReceiptData:
+        """
+        Copy a cached result so callers can't mutate the cached lists;
+        the items themselves are frozen and safe to share
+        """
+        return replace(
+            result,
+            items=list(result.items),
+            parsing_errors=list(result.parsing_errors)
+        )
+
     def _apply_ocr_corrections(self, text: str) -> str:
         """Apply common OCR error corrections"""
         corrected = text
-        for pattern, replacement in self.ocr_corrections.items():
-            corrected = re.sub(pattern, replacement, corrected, flags=re.IGNORECASE)
+        for pattern, replacement in self._OCR_CORRECTION_RES:
+            corrected = pattern.sub(replacement, corrected)
         return corrected
 
     def _detect_store(self, lines: List[str], hint: Optional[str] = None) -> Dict:
@@ -258,23 +428,23 @@ class EnhancedHeuristicParser:
         # Use hint if provided
         if hint:
             hint_upper = hint.upper()
-            for store_key, patterns in self.store_patterns.items():
-                for pattern in patterns['name_variations']:
-                    if re.search(pattern, hint_upper):
+            for store_key, patterns in self._STORE_NAME_RES.items():
+                for pattern in patterns:
+                    if pattern.search(hint_upper):
                         store_info['name'] = store_key
                         store_info['type'] = store_key
-                        store_info['format'] = patterns.get('item_format', 'same_line')
+                        store_info['format'] = self.STORE_PATTERNS[store_key].get('item_format', 'same_line')
                         return store_info
 
         # Search in lines
         for line in lines:
             line_upper = line.upper()
-            for store_key, patterns in self.store_patterns.items():
-                for pattern in patterns['name_variations']:
-                    if re.search(pattern, line_upper):
+            for store_key, patterns in self._STORE_NAME_RES.items():
+                for pattern in patterns:
+                    if pattern.search(line_upper):
                         store_info['name'] = store_key
                         store_info['type'] = store_key
-                        store_info['format'] = patterns.get('item_format', 'same_line')
+                        store_info['format'] = self.STORE_PATTERNS[store_key].get('item_format', 'same_line')
                         return store_info
 
         # Generic store name detection
@@ -286,123 +456,106 @@ class EnhancedHeuristicParser:
 
         return store_info
 
-    def _find_store_number(self, lines: List[str]) -> Optional[str]:
-        """Find store number in receipt"""
-        patterns = [
-            r'STORE\s*#?\s*(\d+)',
-            r'ST#?\s*(\d+)',
-            r'UNIT\s*#?\s*(\d+)',
-            r'#(\d{3,5})\s*$',  # Store number at end of line
-        ]
-
-        for line in lines:
-            for pattern in patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    return match.group(1)
-        return None
-
-    def _find_date(self, lines: List[str]) -> Optional[str]:
-        """Find and normalize date"""
-        patterns = [
-            (r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})', 'mdy'),
-            (r'(\d{2,4})[/-](\d{1,2})[/-](\d{1,2})', 'ymd'),
-            (r'([A-Z]{3})\s+(\d{1,2}),?\s+(\d{4})', 'mdy_text'),
-            (r'(\d{1,2})\s+([A-Z]{3})\s+(\d{4})', 'dmy_text'),
-            # More flexible patterns for common OCR formats
-            (r'(\d{2})[/-](\d{2})[/-](\d{2})\b', 'mdy_short'),  # 01/15/25
-            (r'(\d{4})[.-](\d{2})[.-](\d{2})', 'iso'),  # 2025-01-15
-        ]
-
-        for line in lines[:20]:  # Date usually in first 20 lines
-            for pattern, format_type in patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    try:
-                        # Simple ISO format conversion
-                        if format_type == 'mdy':
-                            m, d, y = match.groups()
-                            if len(y) == 2:
-                                y = '20' + y
-                            return f"{y}-{m.zfill(2)}-{d.zfill(2)}"
-                        elif format_type == 'mdy_short':
-                            m, d, y = match.groups()
-                            y = '20' + y  # Assume 2000s
-                            return f"{y}-{m.zfill(2)}-{d.zfill(2)}"
-                        elif format_type == 'ymd':
-                            y, m, d = match.groups()
-                            return f"{y}-{m.zfill(2)}-{d.zfill(2)}"
-                        elif format_type == 'iso':
-                            return match.group(0)  # Already in ISO
-                        else:
-                            return match.group(0)  # Return as-is for now
-                    except:
-                        return match.group(0)
-        return None
-
-    def _find_time(self, lines: List[str]) -> Optional[str]:
-        """Find transaction time"""
-        time_pattern = r'(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)'
-
-        for line in lines[:20]:
-            match = re.search(time_pattern, line, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        return None
-
-    def _find_totals_cents(self, lines: List[str]) -> Dict[str, int]:
-        """Find all monetary totals and convert to cents"""
-        result = {
+    def _scan_lines(
+        self, lines: List[str]
+    ) -> Tuple[Optional[str], Optional[str], Optional[str], Dict[str, int]]:
+        """
+        Walk the lines once, collecting store number, date, time and totals.
+        Each field keeps the first match, as the separate scans did.
+        """
+        store_id = None
+        date = None
+        time = None
+        totals = {
             'total': 0,
             'subtotal': 0,
             'tax': 0,
             'savings': 0
         }
 
-        # Keywords for each type
-        patterns = {
-            'total': [r'TOTAL', r'BALANCE\s+DUE', r'AMOUNT\s+DUE', r'GRAND\s+TOTAL'],
-            'subtotal': [r'SUBTOTAL', r'SUB\s*-?\s*TOTAL', r'MERCHANDISE'],
-            'tax': [r'TAX', r'GST', r'PST', r'HST', r'SALES\s+TAX'],
-            'savings': [r'SAVINGS', r'YOU\s+SAVED', r'TOTAL\s+SAVINGS', r'DISCOUNT'],
-        }
+        for i, line in enumerate(lines):
+            # Header fields only appear near the top
+            if i < 20:
+                if store_id is None and i < 15:
+                    store_id = self._match_store_number(line)
+                if date is None:
+                    date = self._match_date(line)
+                if time is None:
+                    time = self._match_time(line)
+
+            self._match_totals(line, totals)
+
+        return store_id, date, time, totals
+
+    def _match_store_number(self, line: str) -> Optional[str]:
+        """Find store number in a receipt line"""
+        for pattern in self._STORE_NUMBER_RES:
+            match = pattern.search(line)
+            if match:
+                return match.group(1)
+        return None
 
-        for line in lines:
-            line_upper = line.upper()
+    def _match_date(self, line: str) -> Optional[str]:
+        """Find a date in a receipt line and normalize it to YYYY-MM-DD"""
+        match = self._DATE_RE.search(line)
+        if not match:
+            return None
+
+        format_type = match.lastgroup
+        if format_type == 'ymd':
+            y, m, d = match.group('ymd_y', 'ymd_m', 'ymd_d')
+        elif format_type == 'mdy':
+            m, d, y = match.group('mdy_m', 'mdy_d', 'mdy_y')
+            if len(y) == 2:
+                y = '20' + y  # Assume 2000s
+        elif format_type == 'mdy_text':
+            mon, d, y = match.group('mdy_text_mon', 'mdy_text_d', 'mdy_text_y')
+            m = str(MONTHS[mon[:3].upper()])
+        else:
+            d, mon, y = match.group('dmy_text_d', 'dmy_text_mon', 'dmy_text_y')
+            m = str(MONTHS[mon[:3].upper()])
 
-            # Skip non-monetary totals
-            if any(skip in line_upper for skip in ['TOTAL POINTS', 'REWARDS', 'ITEMS']):
-                continue
+        return f"{y}-{m.zfill(2)}-{d.zfill(2)}"
 
-            # Check each pattern type
-            for total_type, keywords in patterns.items():
-                if any(re.search(kw, line_upper) for kw in keywords):
-                    # Extract price
-                    price_match = re.search(self.price_patterns['standard'], line)
-                    if price_match:
-                        cents = int(float(price_match.group(1)) * 100)
-                        # For savings, check if it's negative
-                        if total_type == 'savings':
-                            neg_match = re.search(self.price_patterns['negative'], line)
-                            if neg_match:
-                                cents = int(float(neg_match.group(1)) * 100)
-
-                        # Only update if not already set or if this looks more reliable
-                        if result[total_type] == 0:
-                            result[total_type] = cents
-
-        return result
+    def _match_time(self, line: str) -> Optional[str]:
+        """Find transaction time in a receipt line"""
+        match = self._TIME_RE.search(line)
+        if match:
+            return match.group(1)
+        return None
+
+    def _match_totals(self, line: str, result: Dict[str, int]) -> None:
+        """Record the monetary total on this line, if any, in cents"""
+        line_upper = line.upper()
+
+        # Skip non-monetary totals
+        if self._TOTALS_SKIP_RE.search(line_upper):
+            return
+
+        match = self._TOTALS_RE.match(line_upper)
+        if not match:
+            return
+        total_type = match.lastgroup.removeprefix('other_')
+
+        # Extract price
+        price_match = self._PRICE_RES['standard'].search(line)
+        if price_match:
+            cents = int(float(price_match.group(1)) * 100)
+            # For savings, check if it's negative
+            if total_type == 'savings':
+                neg_match = self._PRICE_RES['negative'].search(line)
+                if neg_match:
+                    cents = int(float(neg_match.group(1)) * 100)
+
+            # Only update if not already set or if this looks more reliable
+            if result[total_type] == 0:
+                result[total_type] = cents
 
     def _parse_items_by_store(self, lines: List[str], store_info: Dict) -> List[ParsedItem]:
         """Parse items based on store format"""
         store_format = store_info.get('format', 'same_line')
-
-        if store_format == 'separate_line':
-            return self._parse_walmart_style(lines)
-        elif store_format == 'code_first':
-            return self._parse_costco_style(lines)
-        else:
-            return self._parse_standard_format(lines)
+        parser = self.item_parsers.get(store_format, self._parse_standard_format)
+        return parser(lines)
 
     def _parse_standard_format(self, lines: List[str]) -> List[ParsedItem]:
         """Parse standard format: item and price on same line"""
@@ -414,7 +567,7 @@ class EnhancedHeuristicParser:
                 continue
 
             # Look for price at end of line
-            price_match = re.search(self.price_patterns['end_of_line'], line)
+            price_match = self._PRICE_RES['end_of_line'].search(line)
             if not price_match:
                 continue
 
@@ -432,13 +585,14 @@ class EnhancedHeuristicParser:
                 continue
 
             # Check for weighted items
-            weight_match = re.search(self.price_patterns['weighted'], line)
+            weight_match = self._PRICE_RES['weighted'].search(line)
             quantity = 1.0
             unit = 'piece'
 
             if weight_match:
                 quantity = float(weight_match.group(1))
-                unit = weight_match.group(2).lower()
+                # Units come from a tiny vocabulary; share one string per unit
+                unit = sys.intern(weight_match.group(2).lower())
 
             # Detect category
             category = self._detect_category(item_text)
@@ -476,16 +630,18 @@ class EnhancedHeuristicParser:
                 if pending_item:
                     # Attach to previous item
                     price_cents = int(float(price_only_match.group(1)) * 100)
-                    pending_item.price_cents = price_cents
-                    pending_item.raw_text += ' ' + line
-                    pending_item.confidence = self._calculate_item_confidence(
-                        pending_item.item_name, price_cents, pending_item.category
-                    )
-                    items.append(pending_item)
+                    items.append(replace(
+                        pending_item,
+                        price_cents=price_cents,
+                        raw_text=pending_item.raw_text + ' ' + line,
+                        confidence=self._calculate_item_confidence(
+                            pending_item.item_name, price_cents, pending_item.category
+                        )
+                    ))
                     pending_item = None
             else:
                 # Check if line has a price (standard format)
-                price_match = re.search(self.price_patterns['end_of_line'], line)
+                price_match = self._PRICE_RES['end_of_line'].search(line)
 
                 if price_match:
                     # Standard format item
@@ -541,7 +697,7 @@ class EnhancedHeuristicParser:
                 ))
             else:
                 # Try standard format as fallback
-                price_match = re.search(self.price_patterns['end_of_line'], line)
+                price_match = self._PRICE_RES['end_of_line'].search(line)
                 if price_match:
                     price_cents = int(float(price_match.group(1)) * 100)
                     item_text = line[:price_match.start()].strip()
@@ -566,8 +722,8 @@ class EnhancedHeuristicParser:
         line_upper = line.upper()
 
         # Check skip patterns
-        for pattern in self.skip_patterns:
-            if re.search(pattern, line_upper):
+        for pattern in self._SKIP_RES:
+            if pattern.search(line_upper):
                 return True
 
         # Skip total/subtotal/tax lines
@@ -583,8 +739,8 @@ class EnhancedHeuristicParser:
         """Detect item category from name"""
         item_upper = item_text.upper()
 
-        for category, pattern in self.category_patterns.items():
-            if re.search(pattern, item_upper):
+        for category, pattern in self._CATEGORY_RES.items():
+            if pattern.search(item_upper):
                 return category
 
         return None
@@ -620,7 +776,7 @@ class EnhancedHeuristicParser:
         merchant: Optional[str],
         date: Optional[str],
         total_cents: int,
-        items: List[ParsedItem]
+        items_with_price: int
     ) -> float:
         """Calculate overall receipt confidence"""
         confidence = 0.0
@@ -634,8 +790,6 @@ class EnhancedHeuristicParser:
             confidence += 0.05
 
         # Items (70% weight - most important)
-        items_with_price = sum(1 for item in items if item.price_cents > 0)
-
         if items_with_price > 0:
             confidence += 0.20  # Base for having items
 
@@ -653,28 +807,37 @@ class EnhancedHeuristicParser:
 
         return min(confidence, 1.0)
 
-    def _calculate_pairing_ratio(self, items: List[ParsedItem]) -> float:
+    @staticmethod
+    def _items_stats(items: List[ParsedItem]) -> Tuple[int, int]:
+        """Return (sum of item prices, number of items with a price) in one pass"""
+        items_sum_cents = 0
+        items_with_price = 0
+        for item in items:
+            cents = item.price_cents
+            items_sum_cents += cents
+            if cents > 0:
+                items_with_price += 1
+        return items_sum_cents, items_with_price
+
+    def _calculate_pairing_ratio(self, items_with_price: int, item_count: int) -> float:
         """Calculate ratio of items with valid prices"""
-        if not items:
+        if not item_count:
             return 0.0
 
-        items_with_price = sum(1 for item in items if item.price_cents > 0)
-        return items_with_price / len(items)
+        return items_with_price / item_count
 
     def _check_reconciliation(
         self,
-        items: List[ParsedItem],
+        item_count: int,
+        items_sum_cents: int,
         subtotal_cents: int,
         tax_cents: int,
         total_cents: int
     ) -> bool:
         """Check if amounts reconcile"""
-        if not items or not total_cents:
+        if not item_count or not total_cents:
             return False
 
-        # Sum item prices
-        items_sum_cents = sum(item.price_cents for item in items)
-
         # Check subtotal match (more lenient)
         if subtotal_cents:
             tolerance_cents = max(50, int(subtotal_cents * 0.05))  # 50¢ or 5%
@@ -688,13 +851,13 @@ class EnhancedHeuristicParser:
             return abs(calculated_total - total_cents) <= tolerance_cents
 
         # Estimate with typical tax rate (more forgiving)
-        # Tax can range from 0% to 10%
-        for tax_rate in [0, 0.05, 0.065, 0.07, 0.08, 0.0875, 0.10]:
-            estimated_tax = int(items_sum_cents * tax_rate)
-            estimated_total = items_sum_cents + estimated_tax
-            tolerance_cents = max(100, int(total_cents * 0.08))  # 100¢ or 8%
+        tolerance_cents = max(100, int(total_cents * 0.08))  # 100¢ or 8%
+        difference_cents = items_sum_cents - total_cents
+        return any(
+            abs(difference_cents + int(items_sum_cents * tax_rate)) <= tolerance_cents
+            for tax_rate in TYPICAL_TAX_RATES
+        )
 
-            if abs(estimated_total - total_cents) <= tolerance_cents:
-                return True  # Found a tax rate that works!
 
-        return False  # Really can't reconcile
\ No newline at end of file
+# Global instance
+heuristic_parser = EnhancedHeuristicParser()
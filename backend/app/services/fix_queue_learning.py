@@ -4,10 +4,17 @@ Connects user corrections from Fix Queue to the alias learning system
 """
 
 import asyncio
+import json
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from enum import Enum
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from enum import IntFlag
+from operator import attrgetter
 
 import asyncpg
 
@@ -21,16 +28,140 @@ from app.database import get_db_pool
 
 logger = logging.getLogger(__name__)
 
+# Batches at least this large write their metrics inline instead of
+# going through the write-behind buffer
+BULK_COPY_THRESHOLD = 100
+
+# Write-behind buffer for correction metrics: flushed with one COPY once
+# METRICS_FLUSH_SIZE rows are waiting or METRICS_FLUSH_INTERVAL seconds
+# after the first one arrived
+METRICS_QUEUE_SIZE = 4096
+METRICS_FLUSH_SIZE = 64
+METRICS_FLUSH_INTERVAL = 2.0
+
+METRICS_COLUMNS = [
+    'household_id', 'merchant', 'receipt_id',
+    'correction_types', 'created_at'
+]
+
+# Resolve fix queue entries in one statement; resolved_at is bound by
+# the caller so it matches the metrics created_at. Types travel as
+# comma-joined text because unnest() flattens 2-D arrays; only ids
+# that exist come back, so metrics are never written for unknown rows.
+RESOLVE_FIX_QUEUE_SQL = """
+    UPDATE fix_queue
+    SET resolved = true,
+        resolved_at = $3,
+        correction_types = string_to_array(data.correction_types, ',')
+    FROM unnest($1::text[], $2::text[]) AS data(id, correction_types)
+    WHERE fix_queue.id = data.id
+    RETURNING fix_queue.id
+"""
+
+
+class CorrectionType(IntFlag):
+    """Types of corrections made in Fix Queue, combinable as a bitmask"""
+    NAME = 1        # Item name correction
+    QUANTITY = 2    # Quantity correction
+    UNIT = 4        # Unit correction
+    CATEGORY = 8    # Category correction
+    PRICE = 16      # Price correction
+    DELETE = 32     # Item deleted
+    MERGE = 64      # Items merged
+
+
+def correction_type_names(corrections: CorrectionType) -> List[str]:
+    """Names stored in the correction_types text[] columns, e.g. ['name', 'price']"""
+    return [flag.name.lower() for flag in CorrectionType if flag & corrections]
+
+
+@dataclass(slots=True)
+class OriginalRow:
+    """Item as OCR/parsing produced it"""
+    raw_text: Optional[str] = ''
+    parsed_name: Optional[str] = None
+    qty: Optional[float] = None
+    unit: Optional[str] = None
+    categories: Optional[str] = None
+    price: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'OriginalRow':
+        return cls(
+            raw_text=data.get('raw_text', ''),
+            parsed_name=data.get('parsed_name'),
+            qty=data.get('qty'),
+            unit=data.get('unit'),
+            categories=data.get('categories'),
+            price=data.get('price')
+        )
+
+
+@dataclass(slots=True)
+class CorrectedRow:
+    """Item as the user corrected it in Fix Queue"""
+    name: Optional[str] = None
+    qty: Optional[float] = None
+    unit: Optional[str] = None
+    category: Optional[str] = None
+    price: Optional[float] = None
+    deleted: bool = False
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CorrectedRow':
+        return cls(
+            name=data.get('name'),
+            qty=data.get('qty'),
+            unit=data.get('unit'),
+            category=data.get('category'),
+            price=data.get('price'),
+            deleted=data.get('deleted', False)
+        )
 
-class CorrectionType(Enum):
-    """Types of corrections made in Fix Queue"""
-    NAME = "name"          # Item name correction
-    QUANTITY = "quantity"  # Quantity correction
-    UNIT = "unit"         # Unit correction
-    CATEGORY = "category"  # Category correction
-    PRICE = "price"       # Price correction
-    DELETE = "delete"     # Item deleted
-    MERGE = "merge"       # Items merged
+
+# Fields compared by _identify_corrections:
+# (OriginalRow field, CorrectedRow field, flag set when they differ)
+_FIELD_MAP = (
+    ('parsed_name', 'name', CorrectionType.NAME),
+    ('qty', 'qty', CorrectionType.QUANTITY),
+    ('unit', 'unit', CorrectionType.UNIT),
+    ('categories', 'category', CorrectionType.CATEGORY),
+    ('price', 'price', CorrectionType.PRICE),
+)
+ORIGINAL_FIELDS = tuple(original for original, _, _ in _FIELD_MAP)
+CORRECTED_FIELDS = tuple(corrected for _, corrected, _ in _FIELD_MAP)
+_FIELD_FLAGS = tuple(flag for _, _, flag in _FIELD_MAP)
+_original_values = attrgetter(*ORIGINAL_FIELDS)
+_corrected_values = attrgetter(*CORRECTED_FIELDS)
+
+# (fix_queue_id, corrections, household_id, merchant, receipt_id)
+CorrectionRecord = Tuple[str, CorrectionType, str, Optional[str], Optional[str]]
+
+
+# Recently learned aliases are skipped for this long (seconds)
+LEARN_CACHE_TTL = 60.0
+LEARN_CACHE_SIZE = 4096
+
+# Suggestion confidence is LEAST(base + count * CONFIDENCE_STEP, cap).
+# suggest_automation_rules inverts this to filter in HAVING, so the
+# (base, cap) pairs here must stay in sync with the SQL.
+CONFIDENCE_STEP = 0.05
+NAME_CONFIDENCE = (0.6, 0.95)
+CATEGORY_CONFIDENCE = (0.5, 0.9)
+
+
+def min_count_for_confidence(
+    min_confidence: float,
+    base: float,
+    cap: float,
+    min_occurrences: int
+) -> Optional[int]:
+    """Smallest occurrence count reaching min_confidence, or None if unreachable"""
+    if min_confidence > cap:
+        return None
+    # Round away float noise so e.g. (0.8 - 0.6) / 0.05 yields 4, not 5
+    needed = math.ceil(round((min_confidence - base) / CONFIDENCE_STEP, 9))
+    return max(min_occurrences, needed)
 
 
 class FixQueueLearningService:
@@ -43,12 +174,46 @@ class FixQueueLearningService:
         self.alias_service = AliasResolutionService()
         self.normalizer = TokenNormalizer()
         self._pool: Optional[asyncpg.Pool] = None
+        self._pool_lock = asyncio.Lock()
+        self._analytics_queries: Dict[Tuple[bool, bool], str] = {}
+        # (text, class, merchant, household) -> expiry of the last successful learn
+        self._learned: OrderedDict = OrderedDict()
+        self._metrics_queue: asyncio.Queue = asyncio.Queue(METRICS_QUEUE_SIZE)
+        self._metrics_flusher: Optional[asyncio.Task] = None
+
+    async def ensure_ready(self) -> asyncpg.Pool:
+        """
+        Bind the shared connection pool once
+
+        Call at app startup so requests never pay for pool creation;
+        the lock keeps concurrent first callers from creating two pools.
+        """
+        async with self._pool_lock:
+            if self._pool is None:
+                self._pool = await get_db_pool()
+        return self._pool
 
     async def _get_pool(self) -> asyncpg.Pool:
         """Get database connection pool"""
-        if not self._pool:
-            self._pool = await get_db_pool()
-        return self._pool
+        # Steady state is a plain attribute read; only the first call locks
+        pool = self._pool
+        if pool is None:
+            pool = await self.ensure_ready()
+        return pool
+
+    @asynccontextmanager
+    async def _connection(
+        self,
+        conn: Optional[asyncpg.Connection] = None
+    ) -> AsyncIterator[asyncpg.Connection]:
+        """Use the caller's connection, or borrow one from the pool"""
+        if conn is not None:
+            yield conn
+            return
+
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            yield conn
 
     async def process_correction(
         self,
@@ -74,33 +239,13 @@ class FixQueueLearningService:
             True if learning was successful
         """
         try:
-            # Determine what was corrected
-            corrections = self._identify_corrections(
-                original_data, corrected_data
+            corrections, success = await self._learn_from_correction(
+                OriginalRow.from_dict(original_data),
+                CorrectedRow.from_dict(corrected_data),
+                household_id,
+                merchant
             )
 
-            success = True
-
-            # Process name corrections (most valuable for alias learning)
-            if CorrectionType.NAME in corrections:
-                success = await self._learn_name_correction(
-                    original_data.get('raw_text', ''),
-                    original_data.get('parsed_name', ''),
-                    corrected_data.get('name', ''),
-                    corrected_data.get('category', ''),
-                    household_id,
-                    merchant
-                )
-
-            # Process category corrections
-            if CorrectionType.CATEGORY in corrections:
-                await self._learn_category_pattern(
-                    corrected_data.get('name', ''),
-                    corrected_data.get('category', ''),
-                    household_id,
-                    merchant
-                )
-
             # Record the correction for analytics
             await self._record_correction(
                 fix_queue_id,
@@ -116,37 +261,78 @@ class FixQueueLearningService:
             logger.error(f"Error processing correction: {e}")
             return False
 
-    def _identify_corrections(
+    async def _learn_from_correction(
         self,
-        original: Dict,
-        corrected: Dict
-    ) -> List[CorrectionType]:
-        """Identify what types of corrections were made"""
-        corrections = []
+        original: OriginalRow,
+        corrected: CorrectedRow,
+        household_id: str,
+        merchant: Optional[str] = None,
+        category_corrections: Optional[List[Tuple[str, str, str]]] = None
+    ) -> Tuple[CorrectionType, bool]:
+        """
+        Identify what was corrected and learn from it
+
+        When category_corrections is given, (name, category, household_id)
+        is appended to it for later batched tokenizing and upserting
+        instead of the category pattern being learned now.
+        """
+        # Determine what was corrected
+        corrections = self._identify_corrections(original, corrected)
+
+        success = True
+
+        # Process name corrections (most valuable for alias learning)
+        if corrections & CorrectionType.NAME:
+            success = await self._learn_name_correction(
+                original.raw_text,
+                original.parsed_name or '',
+                corrected.name or '',
+                corrected.category or '',
+                household_id,
+                merchant
+            )
 
-        # Check name change
-        if original.get('parsed_name') != corrected.get('name'):
-            corrections.append(CorrectionType.NAME)
+        # Process category corrections
+        if corrections & CorrectionType.CATEGORY:
+            if category_corrections is None:
+                await self._learn_category_pattern(
+                    corrected.name or '',
+                    corrected.category or '',
+                    household_id,
+                    merchant
+                )
+            else:
+                category_corrections.append((
+                    corrected.name or '',
+                    corrected.category or '',
+                    household_id
+                ))
+
+        return corrections, success
 
-        # Check quantity change
-        if original.get('qty') != corrected.get('qty'):
-            corrections.append(CorrectionType.QUANTITY)
+    def _identify_corrections(
+        self,
+        original: OriginalRow,
+        corrected: CorrectedRow
+    ) -> CorrectionType:
+        """Identify what types of corrections were made"""
+        original_values = _original_values(original)
+        corrected_values = _corrected_values(corrected)
 
-        # Check unit change
-        if original.get('unit') != corrected.get('unit'):
-            corrections.append(CorrectionType.UNIT)
+        # Fix Queue often re-posts a row untouched; settle that with one
+        # tuple comparison before checking fields one by one
+        if not corrected.deleted and original_values == corrected_values:
+            return CorrectionType(0)
 
-        # Check category change
-        if original.get('categories') != corrected.get('category'):
-            corrections.append(CorrectionType.CATEGORY)
+        corrections = CorrectionType(0)
 
-        # Check price change
-        if original.get('price') != corrected.get('price'):
-            corrections.append(CorrectionType.PRICE)
+        for old, new, flag in zip(original_values, corrected_values, _FIELD_FLAGS):
+            if old != new:
+                corrections |= flag
 
         # Check if deleted
-        if corrected.get('deleted', False):
-            corrections.append(CorrectionType.DELETE)
+        if corrected.deleted:
+            corrections |= CorrectionType.DELETE
 
         return corrections
 
@@ -164,7 +350,7 @@ class FixQueueLearningService:
             return False
 
         # Create alias from raw text to corrected name
-        success = await learn_ingredient_correction(
+        success = await self._cached_learn(
             raw_text,
             category or corrected_name,  # Use category as class if available
             merchant,
@@ -173,7 +359,7 @@ class FixQueueLearningService:
 
         # If original parsed name was different, also learn that mapping
         if original_name and original_name != raw_text:
-            await learn_ingredient_correction(
+            await self._cached_learn(
                 original_name,
                 category or corrected_name,
                 merchant,
@@ -182,6 +368,36 @@ class FixQueueLearningService:
 
         return success
 
+    async def _cached_learn(
+        self,
+        text: str,
+        correct_class: str,
+        merchant: Optional[str],
+        household_id: Optional[str]
+    ) -> bool:
+        """Learn an alias unless the same one was learned within the TTL"""
+        key = (text, correct_class, merchant, household_id)
+        now = time.monotonic()
+
+        expires = self._learned.get(key)
+        if expires is not None:
+            if expires > now:
+                self._learned.move_to_end(key)
+                return True
+            del self._learned[key]
+
+        success = await learn_ingredient_correction(
+            text, correct_class, merchant, household_id
+        )
+
+        # Only successes are remembered so failures get retried
+        if success:
+            self._learned[key] = now + LEARN_CACHE_TTL
+            if len(self._learned) > LEARN_CACHE_SIZE:
+                self._learned.popitem(last=False)
+
+        return success
+
     async def _learn_category_pattern(
         self,
         item_name: str,
@@ -190,69 +406,241 @@ class FixQueueLearningService:
         merchant: Optional[str] = None
     ):
         """Learn category patterns from corrections"""
+        pattern = self._collect_category_pattern(
+            item_name, category, household_id, merchant
+        )
+
+        if pattern:
+            await self._flush_category_patterns([pattern])
+
+    def _collect_category_pattern(
+        self,
+        item_name: str,
+        category: str,
+        household_id: str,
+        merchant: Optional[str] = None
+    ) -> Optional[Tuple[str, str, str]]:
+        """Build the (token, category, household_id) pattern for a correction"""
         if not item_name or not category:
-            return
+            return None
 
         # Extract key tokens from item name
         tokens = self.normalizer.extract_key_tokens(item_name)
 
-        if tokens:
-            # Create token-based pattern for category
-            main_token = tokens[0]
+        if not tokens:
+            return None
 
-            pool = await self._get_pool()
-            async with pool.acquire() as conn:
-                await conn.execute("""
-                    INSERT INTO ingredient_aliases (
-                        pattern, pattern_type, ingredient_class,
-                        household_id, confidence, source
-                    ) VALUES ($1, $2, $3, $4, $5, $6)
-                    ON CONFLICT (pattern, pattern_type, merchant, household_id)
-                    DO UPDATE SET
-                        ingredient_class = EXCLUDED.ingredient_class,
-                        confidence = GREATEST(
-                            ingredient_aliases.confidence * 1.05,
-                            EXCLUDED.confidence
-                        ),
-                        hit_count = ingredient_aliases.hit_count + 1,
-                        updated_at = NOW()
-                """, main_token, 'token', category,
-                    household_id, 0.7, 'user')
+        # Create token-based pattern for category
+        return tokens[0], category, household_id
+
+    def _collect_category_patterns(
+        self,
+        category_corrections: List[Tuple[str, str, str]]
+    ) -> List[Tuple[str, str, str]]:
+        """Tokenize a batch of (name, category, household_id) corrections"""
+        patterns = []
+        for item_name, category, household_id in category_corrections:
+            pattern = self._collect_category_pattern(item_name, category, household_id)
+            if pattern:
+                patterns.append(pattern)
+        return patterns
+
+    async def _flush_category_patterns(
+        self,
+        patterns: List[Tuple[str, str, str]],
+        conn: Optional[asyncpg.Connection] = None
+    ):
+        """
+        Upsert category patterns with a single unnest-driven INSERT
+
+        Args:
+            patterns: (token, category, household_id) tuples
+            conn: Connection to reuse; one is borrowed from the pool if omitted
+        """
+        # One INSERT can't touch the same row twice, so fold repeats into
+        # a hit count; the latest category for a token wins
+        folded: Dict[Tuple[str, str], List] = {}
+        for token, category, household_id in patterns:
+            entry = folded.setdefault((token, household_id), [category, 0])
+            entry[0] = category
+            entry[1] += 1
+
+        tokens = [token for token, _ in folded]
+        households = [household_id for _, household_id in folded]
+        categories = [entry[0] for entry in folded.values()]
+        # A new row starts at hit_count 0 and each repeat adds one, so
+        # insert (hits - 1) and add it back plus one on conflict
+        extra_hits = [entry[1] - 1 for entry in folded.values()]
+
+        async with self._connection(conn) as conn:
+            await conn.execute("""
+                INSERT INTO ingredient_aliases (
+                    pattern, pattern_type, ingredient_class,
+                    household_id, confidence, source, hit_count
+                )
+                SELECT data.pattern, 'token'::pattern_type, data.ingredient_class,
+                       data.household_id, 0.7, 'user'::alias_source, data.extra_hits
+                FROM unnest($1::text[], $2::text[], $3::text[], $4::int[])
+                    AS data(pattern, ingredient_class, household_id, extra_hits)
+                ON CONFLICT (pattern, pattern_type, merchant, household_id)
+                DO UPDATE SET
+                    ingredient_class = EXCLUDED.ingredient_class,
+                    confidence = GREATEST(
+                        ingredient_aliases.confidence * 1.05,
+                        EXCLUDED.confidence
+                    ),
+                    hit_count = ingredient_aliases.hit_count + EXCLUDED.hit_count + 1,
+                    updated_at = NOW()
+            """, tokens, categories, households, extra_hits)
 
     async def _record_correction(
         self,
         fix_queue_id: str,
-        corrections: List[CorrectionType],
+        corrections: CorrectionType,
         household_id: str,
         merchant: Optional[str] = None,
         receipt_id: Optional[str] = None
     ):
         """Record correction for analytics and learning"""
-        pool = await self._get_pool()
+        await self._record_corrections(
+            [(fix_queue_id, corrections, household_id, merchant, receipt_id)]
+        )
+
+    async def _record_corrections(
+        self,
+        records: List[CorrectionRecord],
+        conn: Optional[asyncpg.Connection] = None
+    ):
+        """
+        Resolve fix queue entries with one UPDATE and track their metrics
+
+        Small batches (the interactive path) hand metrics to the
+        write-behind buffer so callers don't wait on them; large batches
+        COPY them on the same connection.
+
+        Args:
+            records: (fix_queue_id, corrections, household_id, merchant, receipt_id)
+            conn: Connection to reuse; one is borrowed from the pool if omitted
+        """
+        if not records:
+            return
+
+        now = datetime.now(timezone.utc)
+        bulk = len(records) >= BULK_COPY_THRESHOLD
+        # Decode each mask once; the UPDATE and the metrics rows share it
+        type_names = [correction_type_names(record[1]) for record in records]
 
         try:
-            async with pool.acquire() as conn:
-                # Update fix queue entry as resolved
-                await conn.execute("""
-                    UPDATE fix_queue
-                    SET resolved = true,
-                        resolved_at = NOW(),
-                        correction_types = $1
-                    WHERE id = $2
-                """, [c.value for c in corrections], fix_queue_id)
-
-                # Track correction metrics (if table exists)
-                await conn.execute("""
-                    INSERT INTO correction_metrics (
-                        household_id, merchant, receipt_id,
-                        correction_types, created_at
-                    ) VALUES ($1, $2, $3, $4, NOW())
-                    ON CONFLICT DO NOTHING
-                """, household_id, merchant, receipt_id,
-                    [c.value for c in corrections])
+            async with self._connection(conn) as conn:
+                rows = await conn.fetch(
+                    RESOLVE_FIX_QUEUE_SQL,
+                    [record[0] for record in records],
+                    [','.join(names) for names in type_names],
+                    now
+                )
+                resolved = {row['id'] for row in rows}
+
+                # Confirming a row untouched still resolves it, but there
+                # is no correction to track
+                metrics = [
+                    (household_id, merchant, receipt_id, names, now)
+                    for (fix_queue_id, _, household_id, merchant, receipt_id), names
+                    in zip(records, type_names)
+                    if names and fix_queue_id in resolved
+                ]
+
+                if bulk and metrics:
+                    await conn.copy_records_to_table(
+                        'correction_metrics',
+                        records=metrics,
+                        columns=METRICS_COLUMNS
+                    )
 
         except Exception as e:
             logger.debug(f"Could not record metrics: {e}")
+            return
+
+        if not bulk and metrics:
+            self._enqueue_metrics(metrics)
+
+    def _enqueue_metrics(self, metrics: List[Tuple]):
+        """Buffer metrics rows for the background flusher"""
+        if self._metrics_flusher is None or self._metrics_flusher.done():
+            self._metrics_flusher = asyncio.create_task(self._flush_metrics())
+
+        for row in metrics:
+            try:
+                self._metrics_queue.put_nowait(row)
+            except asyncio.QueueFull:
+                # Metrics are best effort; never block the caller on them
+                logger.debug("Metrics buffer full, dropping correction metric")
+
+    async def _flush_metrics(self):
+        """Background task: batch buffered metrics rows into COPYs"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            row = await self._metrics_queue.get()
+            if row is None:
+                return
+
+            batch = [row]
+            deadline = loop.time() + METRICS_FLUSH_INTERVAL
+            stop = False
+
+            while len(batch) < METRICS_FLUSH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._metrics_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                batch.append(row)
+
+            await self._write_metrics(batch)
+            if stop:
+                return
+
+    async def _write_metrics(self, batch: List[Tuple]):
+        """COPY metrics rows, retrying once before dropping them"""
+        for attempt in range(2):
+            try:
+                pool = await self._get_pool()
+                async with pool.acquire() as conn:
+                    await conn.copy_records_to_table(
+                        'correction_metrics',
+                        records=batch,
+                        columns=METRICS_COLUMNS
+                    )
+                return
+            except Exception as e:
+                if attempt:
+                    logger.debug(f"Could not record metrics: {e}")
+
+    async def close(self):
+        """
+        Flush buffered metrics and stop the background flusher
+
+        Call at app shutdown, next to ensure_ready at startup, wherever
+        the service is wired up; otherwise queued metrics are lost.
+        """
+        flusher, self._metrics_flusher = self._metrics_flusher, None
+        if flusher is not None and not flusher.done():
+            await self._metrics_queue.put(None)
+            await flusher
+
+        # Anything left over (e.g. the flusher died) is written directly
+        pending = []
+        while not self._metrics_queue.empty():
+            row = self._metrics_queue.get_nowait()
+            if row is not None:
+                pending.append(row)
+        if pending:
+            await self._write_metrics(pending)
 
     async def bulk_process_corrections(
         self,
@@ -273,24 +661,76 @@ class FixQueueLearningService:
             'failed': 0
         }
 
-        for correction in corrections:
-            try:
-                success = await self.process_correction(
-                    correction['fix_queue_id'],
-                    correction['original_data'],
-                    correction['corrected_data'],
-                    correction['household_id'],
-                    correction.get('merchant'),
-                    correction.get('receipt_id')
-                )
+        if not corrections:
+            return stats
 
-                stats['processed'] += 1
-                if success:
-                    stats['learned'] += 1
+        # Overlap independent corrections, but never wait on more
+        # connections than the pool can hand out
+        pool = await self._get_pool()
+        semaphore = asyncio.Semaphore(min(len(corrections), pool.get_max_size()))
+
+        # Learn concurrently, then write category patterns and record
+        # the whole batch at once
+        records = []
+        category_corrections = []
+
+        async def process_one(correction: Dict) -> Optional[bool]:
+            async with semaphore:
+                try:
+                    fix_queue_id = correction['fix_queue_id']
+                    original_data = correction['original_data']
+                    corrected_data = correction['corrected_data']
+                    household_id = correction['household_id']
+                    merchant = correction.get('merchant')
+                    receipt_id = correction.get('receipt_id')
+                except Exception as e:
+                    logger.error(f"Error in bulk processing: {e}")
+                    return None
+
+                try:
+                    found, success = await self._learn_from_correction(
+                        OriginalRow.from_dict(original_data),
+                        CorrectedRow.from_dict(corrected_data),
+                        household_id, merchant, category_corrections
+                    )
+                except Exception as e:
+                    logger.error(f"Error processing correction: {e}")
+                    return False
 
-            except Exception as e:
-                logger.error(f"Error in bulk processing: {e}")
+                records.append((fix_queue_id, found, household_id, merchant, receipt_id))
+                return success
+
+        results = await asyncio.gather(
+            *(process_one(correction) for correction in corrections)
+        )
+
+        # Both batch writes share one connection. They are deliberately
+        # not wrapped in a transaction: metrics are best effort and a
+        # failure there must not roll back the learned patterns.
+        async with pool.acquire() as conn:
+            # Tokenizing is CPU work: run it in a worker thread while the
+            # batch is recorded, then upsert the resulting patterns. The
+            # event loop keeps using the same TokenNormalizer meanwhile,
+            # which relies on its cache being thread-safe (it holds a lock)
+            category_patterns, _ = await asyncio.gather(
+                asyncio.to_thread(self._collect_category_patterns, category_corrections),
+                self._record_corrections(records, conn)
+            )
+
+            if category_patterns:
+                try:
+                    await self._flush_category_patterns(category_patterns, conn)
+                except Exception as e:
+                    logger.error(f"Error learning category patterns: {e}")
+
+        for success in results:
+            if success is None:
                 stats['failed'] += 1
+                continue
+
+            stats['processed'] += 1
+            if success:
+                stats['learned'] += 1
 
         logger.info(
             f"Bulk processing complete: {stats['processed']} processed, "
@@ -320,87 +760,128 @@ class FixQueueLearningService:
 
         try:
             async with pool.acquire() as conn:
-                # Build query filters
-                filters = ["resolved = true"]
-                params = []
-                param_count = 0
-
+                # Parameters follow the placeholder order in _analytics_sql
+                cutoff = datetime.now(timezone.utc) - timedelta(days=days_back)
+                params = [cutoff]
                 if household_id:
-                    param_count += 1
-                    filters.append(f"household_id = ${param_count}")
                     params.append(household_id)
-
                 if merchant:
-                    param_count += 1
-                    filters.append(f"merchant = ${param_count}")
                     params.append(merchant)
 
-                where_clause = " AND ".join(filters)
-
-                # Get correction statistics
-                stats = await conn.fetchrow(f"""
-                    SELECT
-                        COUNT(*) as total_corrections,
-                        COUNT(DISTINCT household_id) as unique_households,
-                        COUNT(DISTINCT merchant) as unique_merchants,
-                        AVG(CASE WHEN price_diff IS NOT NULL
-                            THEN ABS(price_diff) ELSE 0 END) as avg_price_diff
-                    FROM fix_queue
-                    WHERE {where_clause}
-                    AND resolved_at > NOW() - INTERVAL '{days_back} days'
-                """, *params)
-
-                # Most commonly corrected items
-                common_items = await conn.fetch(f"""
-                    SELECT
-                        raw_text,
-                        parsed_name,
-                        COUNT(*) as correction_count
-                    FROM fix_queue
-                    WHERE {where_clause}
-                    AND resolved_at > NOW() - INTERVAL '{days_back} days'
-                    GROUP BY raw_text, parsed_name
-                    HAVING COUNT(*) > 1
-                    ORDER BY COUNT(*) DESC
-                    LIMIT 20
-                """, *params)
-
-                # Correction type distribution
-                correction_types = await conn.fetch(f"""
-                    SELECT
-                        unnest(correction_types) as correction_type,
-                        COUNT(*) as count
-                    FROM fix_queue
-                    WHERE {where_clause}
-                    AND resolved_at > NOW() - INTERVAL '{days_back} days'
-                    AND correction_types IS NOT NULL
-                    GROUP BY correction_type
-                    ORDER BY count DESC
-                """, *params)
+                # Statistics, most commonly corrected items and the
+                # correction type distribution in one round-trip
+                row = await conn.fetchrow(
+                    self._analytics_sql(bool(household_id), bool(merchant)),
+                    *params
+                )
+                analysis = json.loads(row['payload'])
 
                 return {
-                    'total_corrections': stats['total_corrections'] or 0,
-                    'unique_households': stats['unique_households'] or 0,
-                    'unique_merchants': stats['unique_merchants'] or 0,
-                    'avg_price_diff': float(stats['avg_price_diff'] or 0),
-                    'common_corrections': [
-                        {
-                            'raw_text': item['raw_text'],
-                            'parsed_name': item['parsed_name'],
-                            'count': item['correction_count']
-                        }
-                        for item in common_items
-                    ],
-                    'correction_types': {
-                        ct['correction_type']: ct['count']
-                        for ct in correction_types
-                    }
+                    'total_corrections': analysis['total_corrections'] or 0,
+                    'unique_households': analysis['unique_households'] or 0,
+                    'unique_merchants': analysis['unique_merchants'] or 0,
+                    'avg_price_diff': float(analysis['avg_price_diff'] or 0),
+                    'common_corrections': analysis['common_corrections'],
+                    # [type, count] pairs, most frequent first
+                    'correction_types': dict(analysis['correction_types'])
                 }
 
         except Exception as e:
             logger.error(f"Error analyzing patterns: {e}")
             return {}
 
+    def _analytics_sql(self, by_household: bool, by_merchant: bool) -> str:
+        """
+        SQL for analyze_correction_patterns, built once per filter shape
+
+        The resolved_at cutoff is computed by the caller and bound as $1,
+        so each shape has one fixed statement that asyncpg's per-connection
+        statement cache prepares once and reuses, and the server compares
+        against a constant instead of evaluating NOW() - interval. The filtered slice of
+        fix_queue is scanned once and shared by every aggregate.
+        """
+        key = (by_household, by_merchant)
+        if key in self._analytics_queries:
+            return self._analytics_queries[key]
+
+        # Build query filters
+        filters = [
+            "resolved = true",
+            "resolved_at > $1"
+        ]
+        param_count = 1
+
+        if by_household:
+            param_count += 1
+            filters.append(f"household_id = ${param_count}")
+
+        if by_merchant:
+            param_count += 1
+            filters.append(f"merchant = ${param_count}")
+
+        where_clause = " AND ".join(filters)
+
+        query = f"""
+            WITH base AS MATERIALIZED (
+                SELECT household_id, merchant, price_diff,
+                       raw_text, parsed_name, correction_types
+                FROM fix_queue
+                WHERE {where_clause}
+            ),
+            stats AS (
+                SELECT
+                    COUNT(*) as total_corrections,
+                    COUNT(DISTINCT household_id) as unique_households,
+                    COUNT(DISTINCT merchant) as unique_merchants,
+                    AVG(CASE WHEN price_diff IS NOT NULL
+                        THEN ABS(price_diff) ELSE 0 END) as avg_price_diff
+                FROM base
+            ),
+            common_items AS (
+                SELECT
+                    raw_text,
+                    parsed_name,
+                    COUNT(*) as correction_count
+                FROM base
+                GROUP BY raw_text, parsed_name
+                HAVING COUNT(*) > 1
+                ORDER BY COUNT(*) DESC
+                LIMIT 20
+            ),
+            correction_types AS (
+                SELECT
+                    unnest(correction_types) as correction_type,
+                    COUNT(*) as count
+                FROM base
+                WHERE correction_types IS NOT NULL
+                GROUP BY correction_type
+            )
+            SELECT jsonb_build_object(
+                'total_corrections', stats.total_corrections,
+                'unique_households', stats.unique_households,
+                'unique_merchants', stats.unique_merchants,
+                'avg_price_diff', stats.avg_price_diff,
+                'common_corrections', COALESCE((
+                    SELECT jsonb_agg(jsonb_build_object(
+                        'raw_text', raw_text,
+                        'parsed_name', parsed_name,
+                        'count', correction_count
+                    ) ORDER BY correction_count DESC)
+                    FROM common_items
+                ), '[]'::jsonb),
+                'correction_types', COALESCE((
+                    SELECT jsonb_agg(
+                        jsonb_build_array(correction_type, count)
+                        ORDER BY count DESC
+                    )
+                    FROM correction_types
+                ), '[]'::jsonb)
+            ) as payload
+            FROM stats
+        """
+        self._analytics_queries[key] = query
+        return query
+
     async def suggest_automation_rules(
         self,
         min_occurrences: int = 3,
@@ -419,74 +900,73 @@ class FixQueueLearningService:
         pool = await self._get_pool()
         suggestions = []
 
+        # Only groups whose confidence reaches min_confidence are returned
+        name_min_count = min_count_for_confidence(
+            min_confidence, *NAME_CONFIDENCE, min_occurrences
+        )
+        category_min_count = min_count_for_confidence(
+            min_confidence, *CATEGORY_CONFIDENCE, min_occurrences
+        )
+
         try:
             async with pool.acquire() as conn:
                 # Find consistent name corrections
-                name_patterns = await conn.fetch("""
+                name_patterns = [] if name_min_count is None else await conn.fetch("""
                     SELECT
                         raw_text,
                         parsed_name,
                         corrected_name,
                         category,
                         COUNT(*) as occurrence_count,
-                        COUNT(DISTINCT household_id) as household_count
+                        COUNT(DISTINCT household_id) as household_count,
+                        LEAST(0.6 + COUNT(*) * 0.05, 0.95)::float8 as confidence
                     FROM fix_queue
-                    WHERE resolved = true
-                    AND corrected_name IS NOT NULL
-                    AND raw_text != corrected_name
+                    WHERE resolved = true AND corrected_name IS NOT NULL AND raw_text <> corrected_name
                     GROUP BY raw_text, parsed_name, corrected_name, category
                     HAVING COUNT(*) >= $1
                     ORDER BY COUNT(*) DESC
-                """, min_occurrences)
-
-                for pattern in name_patterns:
-                    # Calculate confidence based on consistency
-                    confidence = min(
-                        0.6 + (pattern['occurrence_count'] * 0.05),
-                        0.95
-                    )
-
-                    if confidence >= min_confidence:
-                        suggestions.append({
-                            'type': 'name_mapping',
-                            'from': pattern['raw_text'],
-                            'to': pattern['corrected_name'],
-                            'category': pattern['category'],
-                            'confidence': confidence,
-                            'occurrences': pattern['occurrence_count'],
-                            'households': pattern['household_count'],
-                            'action': 'create_alias'
-                        })
+                """, name_min_count)
+
+                # Confidence is computed alongside the aggregate
+                suggestions.extend(
+                    {
+                        'type': 'name_mapping',
+                        'from': pattern['raw_text'],
+                        'to': pattern['corrected_name'],
+                        'category': pattern['category'],
+                        'confidence': pattern['confidence'],
+                        'occurrences': pattern['occurrence_count'],
+                        'households': pattern['household_count'],
+                        'action': 'create_alias'
+                    }
+                    for pattern in name_patterns
+                )
 
                 # Find consistent category corrections
-                category_patterns = await conn.fetch("""
+                category_patterns = [] if category_min_count is None else await conn.fetch("""
                     SELECT
                         corrected_name,
                         category,
-                        COUNT(*) as occurrence_count
+                        COUNT(*) as occurrence_count,
+                        LEAST(0.5 + COUNT(*) * 0.05, 0.9)::float8 as confidence
                     FROM fix_queue
-                    WHERE resolved = true
-                    AND category IS NOT NULL
+                    WHERE resolved = true AND category IS NOT NULL
                     GROUP BY corrected_name, category
                     HAVING COUNT(*) >= $1
                     ORDER BY COUNT(*) DESC
-                """, min_occurrences)
-
-                for pattern in category_patterns:
-                    confidence = min(
-                        0.5 + (pattern['occurrence_count'] * 0.05),
-                        0.9
-                    )
-
-                    if confidence >= min_confidence:
-                        suggestions.append({
-                            'type': 'category_mapping',
-                            'item': pattern['corrected_name'],
-                            'category': pattern['category'],
-                            'confidence': confidence,
-                            'occurrences': pattern['occurrence_count'],
-                            'action': 'create_category_rule'
-                        })
+                """, category_min_count)
+
+                suggestions.extend(
+                    {
+                        'type': 'category_mapping',
+                        'item': pattern['corrected_name'],
+                        'category': pattern['category'],
+                        'confidence': pattern['confidence'],
+                        'occurrences': pattern['occurrence_count'],
+                        'action': 'create_category_rule'
+                    }
+                    for pattern in category_patterns
+                )
 
         except Exception as e:
             logger.error(f"Error suggesting rules: {e}")
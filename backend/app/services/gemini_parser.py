@@ -4,24 +4,147 @@ Uses Gemini Flash for intelligent receipt parsing when heuristics fail
 """
 
 import os
+import re
 import json
+import time
+import random
+import asyncio
 import logging
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+from typing import AsyncIterator, Dict, List, Optional
+from dataclasses import dataclass
 
 try:
     import google.generativeai as genai
+    from google.generativeai.types import HarmCategory, HarmBlockThreshold
+    from google.api_core.exceptions import ResourceExhausted
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
+    ResourceExhausted = None
     logger = logging.getLogger(__name__)
     logger.warning("Google Generative AI not installed. Gemini parser disabled.")
     logger.warning("Install with: pip install google-generativeai")
 
 logger = logging.getLogger(__name__)
 
+# orjson decodes Gemini's JSON responses several times faster when installed
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Requests per minute allowed by the API tier (free tier: 15)
+DEFAULT_GEMINI_RPM = 15
+
+# Most output tokens each model may generate per request; a batch is
+# split so its combined per-receipt budget stays within this
+MODEL_OUTPUT_TOKEN_LIMITS = {
+    'gemini-2.5-flash': 65536,
+    'gemini-2.5-flash-lite': 65536,
+    'gemini-1.5-flash': 8192,
+    'gemini-1.5-flash-latest': 8192,
+    'gemini-pro': 2048,
+}
+DEFAULT_OUTPUT_TOKEN_LIMIT = 8192
+
+# Retries after a 429, backing off from this many seconds
+MAX_RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BACKOFF = 2.0
+
+# Strict JSON schema for receipt
+RECEIPT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "merchant": {"type": "string"},
+        "date": {"type": "string"},
+        "total": {"type": "number"},
+        "subtotal": {"type": "number"},
+        "tax": {"type": "number"},
+        "items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "raw_text": {"type": "string"},
+                    "item_name": {"type": "string"},
+                    "price": {"type": "number"},
+                    "quantity": {"type": "number"},
+                    "unit": {"type": "string"},
+                    "category": {"type": "string"}
+                },
+                "required": ["item_name", "price"]
+            }
+        }
+    },
+    "required": ["items"]
+}
+
+# Request settings are identical for every receipt, so they are set as
+# model defaults and converted by the SDK once instead of on every call
+GENERATION_CONFIG = {
+    "temperature": 0,  # Zero temperature for consistent parsing
+    "max_output_tokens": 2048,
+    "response_mime_type": "application/json",
+    "response_schema": RECEIPT_SCHEMA
+}
+
+# Safety settings are less restrictive for receipt parsing
+SAFETY_SETTINGS = [
+    {"category": category, "threshold": HarmBlockThreshold.BLOCK_NONE}
+    for category in (
+        HarmCategory.HARM_CATEGORY_HARASSMENT,
+        HarmCategory.HARM_CATEGORY_HATE_SPEECH,
+        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+    )
+] if GEMINI_AVAILABLE else []
+
+# Longest OCR text sent to Gemini; longer receipts keep their header
+# and totals footer and lose the middle
+MAX_PROMPT_TEXT_CHARS = int(os.getenv('GEMINI_MAX_TEXT_CHARS', 3000))
+TRUNCATION_MARKER = "\n...[truncated]...\n"
+
+
+def bound_text(text: str, cap: int = MAX_PROMPT_TEXT_CHARS) -> str:
+    """Cap text length, keeping its start (merchant) and end (totals)"""
+    if len(text) <= cap:
+        return text
+
+    logger.info(f"Truncating {len(text)} chars of OCR text to {cap} for Gemini")
+    return text[:cap // 2] + TRUNCATION_MARKER + text[-(cap - cap // 2):]
+
+
+# Start of the items array in a (possibly partial) receipt response
+ITEMS_ARRAY_RE = re.compile(r'"items"\s*:\s*\[')
+
+# One result per receipt, in the order they appear in the prompt
+BATCH_RECEIPT_SCHEMA = {
+    "type": "array",
+    "items": RECEIPT_SCHEMA
+}
+
+ABBREVIATIONS = """Normalize abbreviations:
+ORG→Organic, MLK→Milk, WHP→Whipped, WHD→Whipped, CRM→Cream, HVY→Heavy
+CHKN→Chicken, BF→Beef, CHZ→Cheese, CHED→Cheddar, VEG→Vegetable
+GRND→Ground, BRST→Breast, BNLS→Boneless, SKLS→Skinless
+WHL→Whole, SM/SML→Small, LG/LRG→Large
+"""
+
+PROMPT_PREFIX = f"""Extract all items from this receipt.
+
+{ABBREVIATIONS}
+Receipt text:
+"""
 
-@dataclass
+BATCH_PROMPT_PREFIX = f"""Extract all items from each numbered receipt below.
+Return one result per receipt, in the same order.
+
+{ABBREVIATIONS}
+"""
+
+
+@dataclass(slots=True, frozen=True)
 class ParsedItem:
     """Parsed line item from receipt"""
     raw_text: str
@@ -33,7 +156,7 @@ class ParsedItem:
     confidence: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ParsedReceipt:
     """Complete parsed receipt"""
     merchant: Optional[str] = None
@@ -46,15 +169,44 @@ class ParsedReceipt:
     processing_notes: str = ""
 
 
+class TokenBucket:
+    """
+    Smooths Gemini calls to the tier's requests-per-minute so bursts
+    wait locally instead of drawing 429s
+    """
+
+    def __init__(self, rpm: int):
+        self.capacity = rpm
+        self.tokens = float(rpm)
+        self.rate = rpm / 60.0  # Tokens per second
+        self.last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    async def acquire(self):
+        """Wait until a request may be sent, then take its token"""
+        self._refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= 1
+
+
 class GeminiReceiptParser:
     """
     Intelligent receipt parser using Gemini Flash
     Cost-effective fallback when heuristics fail
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, rpm: Optional[int] = None):
         """Initialize Gemini parser with API key"""
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        self.rate_limiter = TokenBucket(
+            rpm or int(os.getenv('GEMINI_RPM', DEFAULT_GEMINI_RPM))
+        )
 
         if not GEMINI_AVAILABLE:
             logger.warning("Gemini parser disabled - google-generativeai not installed")
@@ -79,7 +231,10 @@ class GeminiReceiptParser:
 
             for model_name in model_names:
                 try:
-                    self.model = genai.GenerativeModel(model_name)
+                    self.model = self._create_model(model_name)
+                    self.max_output_tokens = MODEL_OUTPUT_TOKEN_LIMITS.get(
+                        model_name, DEFAULT_OUTPUT_TOKEN_LIMIT
+                    )
                     self.enabled = True
                     logger.info(f"Gemini parser initialized successfully with {model_name}")
                     break
@@ -93,6 +248,15 @@ class GeminiReceiptParser:
             logger.error(f"Failed to initialize Gemini: {e}")
             self.enabled = False
 
+    @staticmethod
+    def _create_model(model_name: str):
+        """Model with the receipt generation and safety settings as defaults"""
+        return genai.GenerativeModel(
+            model_name,
+            generation_config=GENERATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS
+        )
+
     async def parse_receipt(self, ocr_text: str) -> ParsedReceipt:
         """
         Parse receipt text using Gemini with JSON mode
@@ -115,87 +279,17 @@ class GeminiReceiptParser:
             # Create minimal prompt for Gemini
             prompt = self._create_prompt(ocr_text)
 
-            # Define strict JSON schema for receipt
-            receipt_schema = {
-                "type": "object",
-                "properties": {
-                    "merchant": {"type": "string"},
-                    "date": {"type": "string"},
-                    "total": {"type": "number"},
-                    "subtotal": {"type": "number"},
-                    "tax": {"type": "number"},
-                    "items": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "raw_text": {"type": "string"},
-                                "item_name": {"type": "string"},
-                                "price": {"type": "number"},
-                                "quantity": {"type": "number"},
-                                "unit": {"type": "string"},
-                                "category": {"type": "string"}
-                            },
-                            "required": ["item_name", "price"]
-                        }
-                    }
-                },
-                "required": ["items"]
-            }
-
-            # Configure safety settings to be less restrictive for receipt parsing
-            from google.generativeai.types import HarmCategory, HarmBlockThreshold
-
-            safety_settings = [
-                {
-                    "category": HarmCategory.HARM_CATEGORY_HARASSMENT,
-                    "threshold": HarmBlockThreshold.BLOCK_NONE,
-                },
-                {
-                    "category": HarmCategory.HARM_CATEGORY_HATE_SPEECH,
-                    "threshold": HarmBlockThreshold.BLOCK_NONE,
-                },
-                {
-                    "category": HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-                    "threshold": HarmBlockThreshold.BLOCK_NONE,
-                },
-                {
-                    "category": HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
-                    "threshold": HarmBlockThreshold.BLOCK_NONE,
-                },
-            ]
-
             # Generate response with JSON mode
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0,  # Zero temperature for consistent parsing
-                    "max_output_tokens": 2048,
-                    "response_mime_type": "application/json",
-                    "response_schema": receipt_schema
-                },
-                safety_settings=safety_settings
-            )
+            response = await self._generate(prompt)
 
             # Extract response text (guaranteed to be valid JSON)
-            raw_text = None
-            if response.text:
-                raw_text = response.text
-            elif response.candidates:
-                candidate = response.candidates[0]
-                if candidate.content and candidate.content.parts:
-                    raw_text = candidate.content.parts[0].text
-                else:
-                    logger.warning(f"Gemini response blocked or empty. Finish reason: {candidate.finish_reason if candidate else 'unknown'}")
-                    raise Exception("Gemini response was filtered or empty")
-            else:
-                raise Exception("No valid response from Gemini")
+            raw_text = self._response_text(response)
 
             # Log the raw response for debugging
             logger.info(f"Gemini JSON response (first 500 chars): {raw_text[:500] if raw_text else 'None'}")
 
             # Parse JSON (no markdown extraction needed - JSON mode guarantees valid JSON)
-            result = json.loads(raw_text)
+            result = json_loads(raw_text)
 
             # Convert to ParsedReceipt
             receipt = self._parse_response(result, ocr_text)
@@ -213,35 +307,195 @@ class GeminiReceiptParser:
                 processing_notes=f"Parsing error: {str(e)}"
             )
 
-    def _create_prompt(self, ocr_text: str) -> str:
-        """Create minimal prompt for Gemini JSON mode"""
-        return f"""Extract all items from this receipt.
+    async def parse_receipts_batch(self, ocr_texts: List[str]) -> List[ParsedReceipt]:
+        """
+        Parse several receipts with a single Gemini request
 
-Normalize abbreviations:
-ORG→Organic, MLK→Milk, WHP→Whipped, WHD→Whipped, CRM→Cream, HVY→Heavy
-CHKN→Chicken, BF→Beef, CHZ→Cheese, CHED→Cheddar, VEG→Vegetable
-GRND→Ground, BRST→Breast, BNLS→Boneless, SKLS→Skinless
-WHL→Whole, SM/SML→Small, LG/LRG→Large
+        One call per batch instead of per receipt stretches the daily
+        request quota and shares the prompt preamble across receipts.
+        Batches larger than the model's output limit allows are sent as
+        several requests.
 
-Receipt text:
-{ocr_text}"""
+        Args:
+            ocr_texts: Raw OCR text of each receipt
+
+        Returns:
+            One ParsedReceipt per input, in the same order
+        """
+        if not ocr_texts:
+            return []
+
+        if not self.enabled:
+            logger.warning("Gemini parser not enabled")
+            return [
+                ParsedReceipt(
+                    items=[],
+                    confidence=0.0,
+                    processing_notes="Gemini parser not available"
+                )
+                for _ in ocr_texts
+            ]
+
+        per_receipt = GENERATION_CONFIG["max_output_tokens"]
+        batch_size = max(1, self.max_output_tokens // per_receipt)
+        batches = await asyncio.gather(*(
+            self._parse_batch(ocr_texts[start:start + batch_size])
+            for start in range(0, len(ocr_texts), batch_size)
+        ))
+        return [receipt for batch in batches for receipt in batch]
+
+    async def _parse_batch(self, ocr_texts: List[str]) -> List[ParsedReceipt]:
+        """One batch request; ocr_texts must fit the model's output limit"""
+        try:
+            prompt = self._create_batch_prompt(ocr_texts)
+
+            response = await self._generate(prompt, generation_config={
+                "max_output_tokens": min(
+                    GENERATION_CONFIG["max_output_tokens"] * len(ocr_texts),
+                    self.max_output_tokens
+                ),
+                "response_schema": BATCH_RECEIPT_SCHEMA
+            })
+
+            results = json_loads(self._response_text(response))
+
+            receipts = [
+                self._parse_response(result, ocr_text)
+                for result, ocr_text in zip(results, ocr_texts)
+            ]
+
+            # A short answer leaves the trailing receipts unparsed
+            for _ in range(len(receipts), len(ocr_texts)):
+                receipts.append(ParsedReceipt(
+                    items=[],
+                    confidence=0.0,
+                    processing_notes="Missing from batch response"
+                ))
+
+            logger.info(f"Gemini batch parsed {len(results)}/{len(ocr_texts)} receipts")
+
+            return receipts
+
+        except Exception as e:
+            logger.error(f"Gemini batch parsing error: {e}")
+            return [
+                ParsedReceipt(
+                    items=[],
+                    confidence=0.0,
+                    processing_notes=f"Parsing error: {str(e)}"
+                )
+                for _ in ocr_texts
+            ]
+
+    async def stream_receipt_items(self, ocr_text: str) -> AsyncIterator[ParsedItem]:
+        """
+        Parse receipt text with a streamed Gemini response, yielding each
+        item as soon as its JSON object is complete
+
+        Lets callers render items while the rest of the response is still
+        being generated. Errors are logged and end the stream.
+
+        Args:
+            ocr_text: Raw OCR text from receipt
+
+        Yields:
+            ParsedItem for each item, in receipt order
+        """
+        if not self.enabled:
+            logger.warning("Gemini parser not enabled")
+            return
+
+        decoder = json.JSONDecoder()
+        buffer = ''
+        pos = None  # Where the next unread item starts, once the array opens
+        done = False
+
+        try:
+            response = await self._generate(self._create_prompt(ocr_text), stream=True)
+
+            async for chunk in response:
+                buffer += chunk.text
+                if done:
+                    continue
+
+                if pos is None:
+                    match = ITEMS_ARRAY_RE.search(buffer)
+                    if not match:
+                        continue
+                    pos = match.end()
+
+                # Decode every complete object; a partial one waits for
+                # the next chunk
+                while True:
+                    while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                        pos += 1
+                    if pos >= len(buffer):
+                        break
+                    if buffer[pos] == ']':
+                        done = True
+                        break
+                    try:
+                        item_data, pos = decoder.raw_decode(buffer, pos)
+                    except ValueError:
+                        break
+                    yield self._parse_item(item_data)
+
+        except Exception as e:
+            logger.error(f"Gemini streaming error: {e}")
+
+    async def _generate(self, prompt: str, **kwargs):
+        """
+        Call Gemini within the RPM budget, backing off with jitter
+        when the API still answers 429
+
+        kwargs go to generate_content_async; a generation_config there
+        only needs the fields that differ from GENERATION_CONFIG.
+        """
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            await self.rate_limiter.acquire()
+            try:
+                return await self.model.generate_content_async(
+                    prompt,
+                    **kwargs
+                )
+            except ResourceExhausted:
+                if attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                delay = RATE_LIMIT_BACKOFF * 2 ** attempt
+                delay += random.uniform(0, delay)
+                logger.warning(f"Gemini rate limited, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _response_text(self, response) -> str:
+        """Pull the JSON text out of a Gemini response"""
+        if response.text:
+            return response.text
+
+        if response.candidates:
+            candidate = response.candidates[0]
+            if candidate.content and candidate.content.parts:
+                return candidate.content.parts[0].text
+            logger.warning(f"Gemini response blocked or empty. Finish reason: {candidate.finish_reason if candidate else 'unknown'}")
+            raise Exception("Gemini response was filtered or empty")
+
+        raise Exception("No valid response from Gemini")
+
+    def _create_batch_prompt(self, ocr_texts: List[str]) -> str:
+        """Create one prompt covering several numbered receipts"""
+        receipts = '\n'.join(
+            f"---RECEIPT {number}---\n{bound_text(ocr_text)}"
+            for number, ocr_text in enumerate(ocr_texts, 1)
+        )
+        return BATCH_PROMPT_PREFIX + receipts
+
+    def _create_prompt(self, ocr_text: str) -> str:
+        """Create minimal prompt for Gemini JSON mode"""
+        return PROMPT_PREFIX + bound_text(ocr_text)
 
     def _parse_response(self, result: Dict, original_text: str) -> ParsedReceipt:
         """Convert Gemini response to ParsedReceipt"""
-        items = []
-
         # Parse items
-        for item_data in result.get('items', []):
-            item = ParsedItem(
-                raw_text=item_data.get('raw_text', ''),
-                item_name=item_data.get('item_name', ''),
-                quantity=float(item_data.get('quantity', 1.0)),
-                unit=item_data.get('unit', 'piece'),
-                price=item_data.get('price'),
-                category=item_data.get('category'),
-                confidence=0.85  # High confidence from LLM parsing
-            )
-            items.append(item)
+        items = [self._parse_item(item_data) for item_data in result.get('items', [])]
 
         # Create receipt
         receipt = ParsedReceipt(
@@ -257,6 +511,18 @@ Receipt text:
 
         return receipt
 
+    def _parse_item(self, item_data: Dict) -> ParsedItem:
+        """Convert one item of a Gemini response to ParsedItem"""
+        return ParsedItem(
+            raw_text=item_data.get('raw_text', ''),
+            item_name=item_data.get('item_name', ''),
+            quantity=float(item_data.get('quantity', 1.0)),
+            unit=item_data.get('unit', 'piece'),
+            price=item_data.get('price'),
+            category=item_data.get('category'),
+            confidence=0.85  # High confidence from LLM parsing
+        )
+
     def estimate_cost(self, text_length: int) -> float:
         """
         Estimate cost for processing text
@@ -280,98 +546,3 @@ Receipt text:
         # Typical receipt: ~$0.00015 (0.015¢) if paying
         # But FREE within generous tier limits!
         return total_cost
-
-
-class HybridReceiptParser:
-    """
-    Hybrid parser that combines heuristics with Gemini fallback
-    """
-
-    def __init__(self, gemini_api_key: Optional[str] = None):
-        """Initialize hybrid parser"""
-        from app.services.receipt_heuristics_py import ReceiptHeuristics
-
-        self.heuristics = ReceiptHeuristics()
-        self.gemini = GeminiReceiptParser(gemini_api_key)
-        self.use_gemini_threshold = 0.5  # Use Gemini if confidence < 50%
-        self.min_items_threshold = 3  # Require at least 3 items parsed
-
-    async def parse(self, ocr_text: str, force_gemini: bool = False) -> Dict:
-        """
-        Parse receipt with hybrid approach
-
-        Args:
-            ocr_text: Raw OCR text
-            force_gemini: Skip heuristics, use Gemini directly
-
-        Returns:
-            Parsed receipt data with source indicator
-        """
-        # Try heuristics first (unless forced to use Gemini)
-        if not force_gemini:
-            logger.info("Trying heuristics first...")
-            heuristics_result = await self.heuristics.process(ocr_text)
-
-            # Check if heuristics are sufficient
-            confidence = heuristics_result.get('confidence', 0)
-            items = heuristics_result.get('lines', [])
-            items_with_prices = [item for item in items if item.get('price', 0) > 0]
-
-            logger.info(f"Heuristics: confidence={confidence:.2f}, items={len(items)}, "
-                       f"items_with_prices={len(items_with_prices)}")
-
-            # Decision logic for using heuristics vs Gemini
-            use_heuristics = (
-                confidence >= self.use_gemini_threshold and
-                len(items_with_prices) >= self.min_items_threshold
-            )
-
-            if use_heuristics:
-                logger.info("Using heuristics result (sufficient confidence and items)")
-                heuristics_result['source'] = 'heuristics'
-                heuristics_result['gemini_cost'] = 0.0
-                return heuristics_result
-            else:
-                logger.info(f"Heuristics insufficient: confidence={confidence:.2f} < {self.use_gemini_threshold} "
-                           f"or items_with_prices={len(items_with_prices)} < {self.min_items_threshold}")
-
-        # Fall back to Gemini for better parsing
-        if self.gemini.enabled:
-            logger.info("Using Gemini for intelligent parsing...")
-
-            # Estimate cost
-            estimated_cost = self.gemini.estimate_cost(len(ocr_text))
-            logger.info(f"Estimated Gemini cost: ${estimated_cost:.6f}")
-
-            # Parse with Gemini
-            gemini_result = await self.gemini.parse_receipt(ocr_text)
-
-            # Convert to API format
-            result = {
-                'merchant': gemini_result.merchant,
-                'date': gemini_result.date,
-                'total': gemini_result.total,
-                'subtotal': gemini_result.subtotal,
-                'tax': gemini_result.tax,
-                'lines': [asdict(item) for item in gemini_result.items],
-                'confidence': gemini_result.confidence,
-                'source': 'gemini',
-                'gemini_cost': estimated_cost,
-                'processing_notes': gemini_result.processing_notes
-            }
-
-            return result
-        else:
-            # No Gemini available, return heuristics result
-            logger.warning("Gemini not available, using heuristics only")
-            if force_gemini:
-                # Was specifically asked for Gemini but it's not available
-                return {
-                    'error': 'Gemini parser not available',
-                    'source': 'error',
-                    'lines': []
-                }
-            else:
-                # Return the heuristics result we already have
-                heuristics_result['source'] = 'heuristics_fallback'
-                return heuristics_result
\ No newline at end of file
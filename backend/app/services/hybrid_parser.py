@@ -6,17 +6,53 @@ Target: $0 cost for 80% of receipts
 
 import os
 import json
+import asyncio
 import logging
 import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
-from app.services.enhanced_heuristics import EnhancedHeuristicParser, ReceiptData
+from app.services.enhanced_heuristics import ReceiptData, heuristic_parser
 from app.services.gemini_parser import GeminiReceiptParser
 from app.utils.pii_redaction import redact_pii, detect_pii
 
 logger = logging.getLogger(__name__)
 
+def _parse_in_worker(ocr_text: str, store_hint: Optional[str]) -> ReceiptData:
+    """Heuristic parse inside a worker process, with that process's parser"""
+    return heuristic_parser.parse_sync(ocr_text, store_hint)
+
+
+# Selective Gemini prompts; only the substitutions vary per receipt
+TOTALS_PROMPT_TEMPLATE = """Verify these receipt totals. Return JSON only.
+
+Found: Total=${total:.2f}, Tax=${tax:.2f}
+
+OCR Text:
+{ocr_tail}
+
+Return: {{"total": number, "tax": number, "subtotal": number}}
+"""
+
+ITEMS_PROMPT_TEMPLATE = """Parse these unclear receipt items. Fix OCR errors.
+
+Store: {merchant}
+
+Unclear items:
+{problem_lines}
+
+Return JSON:
+{{
+    "items": [
+        {{"name": "string", "price": number, "quantity": number, "confidence": 0-1}}
+    ],
+    "total": number
+}}
+"""
+
 
 class HybridReceiptParser:
     """
@@ -24,17 +60,41 @@ class HybridReceiptParser:
     then falls back to Gemini only when needed
     """
 
-    def __init__(self, gemini_api_key: Optional[str] = None):
-        """Initialize both parsers"""
-        self.heuristic_parser = EnhancedHeuristicParser()
+    def __init__(
+        self,
+        gemini_api_key: Optional[str] = None,
+        cache_size: int = 1024,
+        heuristic_workers: Optional[int] = None
+    ):
+        """
+        Initialize both parsers
+
+        With heuristic_workers (or HEURISTIC_WORKERS) above zero, the
+        regex-heavy heuristic parse runs in a process pool so it uses
+        other cores and never holds this event loop.
+        """
+        self.heuristic_parser = heuristic_parser
         self.gemini_parser = GeminiReceiptParser(api_key=gemini_api_key)
 
+        if heuristic_workers is None:
+            heuristic_workers = int(os.getenv('HEURISTIC_WORKERS', 0))
+        self._heuristic_pool = (
+            ProcessPoolExecutor(max_workers=heuristic_workers)
+            if heuristic_workers > 0 else None
+        )
+
+        # LRU of final responses for resubmitted receipts, keyed by
+        # (content hash, store hint, force_gemini)
+        self._response_cache: OrderedDict = OrderedDict()
+        self._cache_size = cache_size
+
         # Track usage for cost monitoring
         self.stats = {
             'total_processed': 0,
             'heuristic_only': 0,
             'gemini_used': 0,
             'gemini_calls_today': 0,
+            'cache_hits': 0,
             'last_reset': datetime.now()
         }
 
@@ -61,12 +121,22 @@ class HybridReceiptParser:
         Returns:
             Parsed receipt data with source and cost info
         """
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         self.stats['total_processed'] += 1
 
         # Reset daily counters if needed
         self._check_daily_reset()
 
+        # Calculate content hash for idempotency; retried uploads of the
+        # same receipt are answered from the cache without any parsing.
+        # A short BLAKE2b digest is plenty for a key and far cheaper than SHA-256.
+        content_hash = hashlib.blake2b(ocr_text.encode(), digest_size=8).hexdigest()
+        cache_key = (content_hash, store_hint, force_gemini)
+
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
+
         # Redact PII before processing
         detected_pii = detect_pii(ocr_text)
         safe_text = redact_pii(ocr_text)
@@ -74,11 +144,8 @@ class HybridReceiptParser:
         if detected_pii:
             logger.info(f"PII detected and redacted: {list(detected_pii.keys())}")
 
-        # Calculate content hash for idempotency
-        content_hash = hashlib.sha256(ocr_text.encode()).hexdigest()[:16]
-
         # Step 1: Always try heuristics first (FREE)
-        heuristic_result = await self.heuristic_parser.parse(safe_text, store_hint)
+        heuristic_result = await self._run_heuristics(safe_text, store_hint)
 
         # Log heuristic performance
         logger.info(
@@ -95,22 +162,22 @@ class HybridReceiptParser:
         if not use_gemini:
             # Heuristics succeeded!
             self.stats['heuristic_only'] += 1
-            processing_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+            processing_ms = int((time.perf_counter() - start_time) * 1000)
 
-            return self._format_response(
+            return self._store_response(cache_key, self._format_response(
                 heuristic_result,
                 source='heuristics',
                 processing_ms=processing_ms,
                 gemini_cost=0.0,
                 content_hash=content_hash,
                 detected_pii=detected_pii
-            )
+            ))
 
         # Step 3: Check rate limits before using Gemini
         if not self._check_rate_limit(user_id):
             logger.warning(f"Rate limit exceeded for user {user_id}")
             # Return heuristic result even if not perfect
-            processing_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+            processing_ms = int((time.perf_counter() - start_time) * 1000)
 
             return self._format_response(
                 heuristic_result,
@@ -124,7 +191,7 @@ class HybridReceiptParser:
         # Step 4: Use Gemini for enhancement
         if not self.gemini_parser.enabled:
             logger.warning("Gemini not available, using heuristics only")
-            processing_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+            processing_ms = int((time.perf_counter() - start_time) * 1000)
 
             return self._format_response(
                 heuristic_result,
@@ -150,7 +217,7 @@ class HybridReceiptParser:
             # Estimate cost (Gemini Flash: ~$0.00004 per receipt)
             gemini_cost = self._estimate_gemini_cost(len(gemini_prompt))
 
-            processing_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+            processing_ms = int((time.perf_counter() - start_time) * 1000)
 
             logger.info(
                 f"Gemini enhancement complete: "
@@ -158,19 +225,19 @@ class HybridReceiptParser:
                 f"cost=${gemini_cost:.6f}"
             )
 
-            return self._format_response(
+            return self._store_response(cache_key, self._format_response(
                 merged_result,
                 source='heuristics+gemini',
                 processing_ms=processing_ms,
                 gemini_cost=gemini_cost,
                 content_hash=content_hash,
                 detected_pii=detected_pii
-            )
+            ))
 
         except Exception as e:
             logger.error(f"Gemini enhancement failed: {e}")
             # Fall back to heuristic result
-            processing_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+            processing_ms = int((time.perf_counter() - start_time) * 1000)
 
             return self._format_response(
                 heuristic_result,
@@ -181,6 +248,57 @@ class HybridReceiptParser:
                 detected_pii=detected_pii
             )
 
+    async def _run_heuristics(self, text: str, store_hint: Optional[str]) -> ReceiptData:
+        """Heuristic parse, in the process pool when one is configured"""
+        if self._heuristic_pool is None:
+            return await self.heuristic_parser.parse(text, store_hint)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._heuristic_pool, _parse_in_worker, text, store_hint
+        )
+
+    def close(self):
+        """Shut down the heuristic worker processes, if any"""
+        if self._heuristic_pool is not None:
+            self._heuristic_pool.shutdown()
+            self._heuristic_pool = None
+
+    def _cached_response(self, cache_key: Tuple) -> Optional[Dict]:
+        """Replay a cached response for a resubmitted receipt"""
+        cached = self._response_cache.get(cache_key)
+        if cached is None:
+            return None
+
+        self._response_cache.move_to_end(cache_key)
+        self.stats['cache_hits'] += 1
+
+        response = self._copy_response(cached)
+        response['source'] = 'cache'
+        response['processing_time_ms'] = 0
+        response['gemini_cost'] = 0.0
+        response['stats'] = self._response_stats()
+        return response
+
+    def _store_response(self, cache_key: Tuple, response: Dict) -> Dict:
+        """Remember a settled response, then hand it back"""
+        # Only settled results are stored; fallbacks are worth retrying
+        while len(self._response_cache) >= self._cache_size:
+            self._response_cache.popitem(last=False)
+        self._response_cache[cache_key] = self._copy_response(response)
+
+        return response
+
+    @staticmethod
+    def _copy_response(response: Dict) -> Dict:
+        """Copy a response deep enough that callers can't alter the cache"""
+        # stats is replaced on every replay, so it needn't be copied
+        copied = dict(response)
+        copied['lines'] = [dict(line) for line in response['lines']]
+        copied['reconciliation'] = dict(response['reconciliation'])
+        copied['detected_pii'] = list(response['detected_pii'])
+        return copied
+
     def _should_use_gemini(self, heuristic_result: ReceiptData) -> bool:
         """
         Decide if Gemini is needed based on heuristic results
@@ -204,14 +322,13 @@ class HybridReceiptParser:
             return True
 
         # Too few items
-        items_with_price = sum(1 for item in heuristic_result.items if item.price_cents > 0)
+        items_total, items_with_price = heuristic_result.items_stats()
         if items_with_price < 3:
             return True
 
         # Reconciliation failed badly
         if not heuristic_result.reconciliation_ok:
             # Check how badly it failed
-            items_total = sum(item.price_cents for item in heuristic_result.items)
             if heuristic_result.total_cents > 0:
                 diff_percent = abs(items_total - heuristic_result.total_cents) / heuristic_result.total_cents
                 if diff_percent > 0.1:  # More than 10% off
@@ -231,37 +348,21 @@ class HybridReceiptParser:
         ]
 
         if not low_confidence_items and heuristic_result.confidence >= 0.7:
-            # Just need totals verification
-            return f"""
-            Verify these receipt totals. Return JSON only.
-
-            Found: Total=${heuristic_result.total:.2f}, Tax=${heuristic_result.tax:.2f}
-
-            OCR Text:
-            {ocr_text[-500:]}  # Last 500 chars usually has totals
-
-            Return: {{"total": number, "tax": number, "subtotal": number}}
-            """
+            # Just need totals verification; the last 500 chars usually
+            # hold the totals
+            return TOTALS_PROMPT_TEMPLATE.format(
+                total=heuristic_result.total,
+                tax=heuristic_result.tax,
+                ocr_tail=ocr_text[-500:]
+            )
 
         # Focus on problem items
         problem_lines = '\n'.join([item.raw_text for item in low_confidence_items[:10]])
 
-        return f"""
-        Parse these unclear receipt items. Fix OCR errors.
-
-        Store: {heuristic_result.merchant or 'Unknown'}
-
-        Unclear items:
-        {problem_lines}
-
-        Return JSON:
-        {{
-            "items": [
-                {{"name": "string", "price": number, "quantity": number, "confidence": 0-1}}
-            ],
-            "total": number
-        }}
-        """
+        return ITEMS_PROMPT_TEMPLATE.format(
+            merchant=heuristic_result.merchant or 'Unknown',
+            problem_lines=problem_lines
+        )
 
     def _merge_results(self, heuristic: ReceiptData, gemini: any) -> ReceiptData:
         """
@@ -350,9 +451,8 @@ class HybridReceiptParser:
     ) -> Dict:
         """Format response for API"""
         # Convert items to API format
-        lines = []
-        for item in receipt_data.items:
-            lines.append({
+        lines = [
+            {
                 'raw_text': item.raw_text,
                 'item_name': item.item_name,
                 'quantity': item.quantity,
@@ -360,7 +460,9 @@ class HybridReceiptParser:
                 'price': item.price,  # Convert from cents
                 'category': item.category,
                 'confidence': item.confidence
-            })
+            }
+            for item in receipt_data.items
+        ]
 
         return {
             'merchant': receipt_data.merchant,
@@ -382,12 +484,16 @@ class HybridReceiptParser:
             'gemini_cost': gemini_cost,
             'should_skip_llm': not receipt_data.should_use_gemini,
             'detected_pii': list(detected_pii.keys()) if detected_pii else [],
-            'stats': {
-                'total_processed': self.stats['total_processed'],
-                'heuristic_success_rate': self.stats['heuristic_only'] / max(1, self.stats['total_processed']),
-                'gemini_usage_rate': self.stats['gemini_used'] / max(1, self.stats['total_processed']),
-                'daily_gemini_remaining': max(0, self.daily_gemini_limit - self.stats['gemini_calls_today'])
-            }
+            'stats': self._response_stats()
+        }
+
+    def _response_stats(self) -> Dict:
+        """Usage snapshot included with every response"""
+        return {
+            'total_processed': self.stats['total_processed'],
+            'heuristic_success_rate': self.stats['heuristic_only'] / max(1, self.stats['total_processed']),
+            'gemini_usage_rate': self.stats['gemini_used'] / max(1, self.stats['total_processed']),
+            'daily_gemini_remaining': max(0, self.daily_gemini_limit - self.stats['gemini_calls_today'])
         }
 
     def get_usage_stats(self) -> Dict:
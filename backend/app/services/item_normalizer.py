@@ -5,13 +5,17 @@ Normalizes receipt item names to readable, consistent format
 
 import re
 import logging
+from collections import OrderedDict
 from typing import Dict, Optional, List
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+# Words containing a digit keep their casing ("2%", "80/20")
+HAS_DIGIT = re.compile(r'\d').search
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class NormalizedItem:
     """Result from normalization"""
     original: str
@@ -26,7 +30,7 @@ class ItemNormalizer:
     Combines rules, learning, and AI
     """
 
-    def __init__(self):
+    def __init__(self, cache_size: int = 4096):
         # Common abbreviation expansions
         self.abbreviations = {
             # Dairy
@@ -68,7 +72,7 @@ class ItemNormalizer:
             'veg': 'vegetable',
             'frt': 'fruit',
             'org': 'organic',
-            'grn': 'green',
+            'grn': 'grain',
             'red': 'red',
             'yel': 'yellow',
             'wht': 'white',
@@ -88,13 +92,9 @@ class ItemNormalizer:
             'appl': 'apple',
             'orng': 'orange',
             'brry': 'berry',
-            'strw': 'strawberry',
 
             # Pantry
             'brd': 'bread',
-            'wht': 'white',
-            'whl': 'whole',
-            'grn': 'grain',
             'flr': 'flour',
             'sgr': 'sugar',
             'brwn': 'brown',
@@ -102,7 +102,6 @@ class ItemNormalizer:
             'pepp': 'pepper',
             'spce': 'spice',
             'vnla': 'vanilla',
-            'choc': 'chocolate',
             'cndy': 'candy',
             'ckies': 'cookies',
             'crckrs': 'crackers',
@@ -146,7 +145,6 @@ class ItemNormalizer:
             'nat': 'natural',
             'frzn': 'frozen',
             'frsh': 'fresh',
-            'rstd': 'roasted',
             'grld': 'grilled',
             'bkd': 'baked',
             'frd': 'fried'
@@ -171,6 +169,16 @@ class ItemNormalizer:
             'HEB'
         ]
 
+        # Store brands only one chain carries, checked ahead of the shared
+        # list when the merchant name contains the key
+        self.merchant_brand_prefixes = {
+            'COSTCO': ['KIRKLAND SIGNATURE', 'KS'],
+            'TRADER JOE': ['TRADER JOE\'S', 'TJ\'S', 'TJS'],
+            'TARGET': ['GOOD & GATHER', 'MARKET PANTRY', 'FAVORITE DAY'],
+            'ALDI': ['SIMPLY NATURE', 'FRIENDLY FARMS', 'MILLVILLE'],
+            'SAFEWAY': ['O ORGANICS', 'LUCERNE'],
+        }
+
         # Special brand handling (brand products that need special treatment)
         self.brand_products = {
             'SILK': {'append': 'Milk', 'category': 'dairy'},
@@ -196,6 +204,46 @@ class ItemNormalizer:
             'FROSTED FLAKES': {'keep': True}
         }
 
+        # One pass finds every abbreviation standing as its own word
+        # inside a token; the earliest-listed one is expanded
+        self._abbr_re = re.compile(
+            r'\b(?:' + '|'.join(
+                re.escape(abbr) for abbr in sorted(self.abbreviations, key=len, reverse=True)
+            ) + r')\b'
+        )
+        self._abbr_rank = {abbr: rank for rank, abbr in enumerate(self.abbreviations)}
+
+        # Brand lookups in one scan each. Alternation order follows the
+        # lists, so the first listed prefix still wins.
+        self._brand_product_re = re.compile(
+            '|'.join(re.escape(brand) for brand in self.brand_products)
+        )
+        self._brand_prefix_re = self._compile_prefixes(self.brand_prefixes)
+        self._merchant_prefix_res = {
+            merchant: self._compile_prefixes(prefixes + self.brand_prefixes)
+            for merchant, prefixes in self.merchant_brand_prefixes.items()
+        }
+
+        # Receipts repeat the same items constantly, and normalization
+        # is a pure function of (raw_text, merchant)
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = cache_size
+
+        # OCR often emits the same row back to back; remember the last
+        # item so those repeats skip even the LRU bookkeeping
+        self._last_key: Optional[tuple] = None
+        self._last_result: Optional[NormalizedItem] = None
+
+        # Many raw spellings normalize to the same name ("Whole Milk");
+        # share one string object per name, oldest dropped first
+        self._names: Dict[str, str] = {}
+        self._names_size = 10000
+
+        # Cleanup patterns applied to every item
+        self._upc_re = re.compile(r'\b\d{10,}\b')  # UPC codes (long numbers)
+        self._store_code_re = re.compile(r'\s+[A-Z]$')  # Single letters at end
+        self._price_re = re.compile(r'\s+\d+\.\d{2}$')  # Price if included
+
     def normalize(self, raw_text: str, merchant: Optional[str] = None) -> NormalizedItem:
         """
         Normalize an item name
@@ -207,36 +255,49 @@ class ItemNormalizer:
         Returns:
             NormalizedItem with cleaned name
         """
-        # Start with original
+        cache_key = (raw_text, merchant)
+        if cache_key == self._last_key:
+            return self._last_result
+
+        result = self._cache.get(cache_key)
+        if result is not None:
+            self._cache.move_to_end(cache_key)
+        else:
+            result = self._normalize(raw_text, merchant)
+
+            while len(self._cache) >= self._cache_size:
+                self._cache.popitem(last=False)
+            self._cache[cache_key] = result
+
+        self._last_key = cache_key
+        self._last_result = result
+        return result
+
+    def _normalize(self, raw_text: str, merchant: Optional[str]) -> NormalizedItem:
+        """Normalize an item name without consulting the cache"""
+        # Start with original, then drop UPC codes, store codes and price.
+        # Each strip exposes the next suffix to the end-anchored patterns.
         normalized = raw_text.upper().strip()
-
-        # Remove UPC codes (long numbers)
-        normalized = re.sub(r'\b\d{10,}\b', '', normalized).strip()
-
-        # Remove store codes (single letters at end)
-        normalized = re.sub(r'\s+[A-Z]$', '', normalized).strip()
-
-        # Remove price if included
-        normalized = re.sub(r'\s+\d+\.\d{2}$', '', normalized).strip()
+        normalized = self._upc_re.sub('', normalized).strip()
+        normalized = self._store_code_re.sub('', normalized).strip()
+        normalized = self._price_re.sub('', normalized).strip()
 
         # Apply special brand handling first
         normalized = self._handle_brands(normalized)
 
         # Remove generic store brands
-        for brand in self.brand_prefixes:
-            if normalized.startswith(brand + ' '):
-                normalized = normalized[len(brand)+1:].strip()
-                break
-
-        # Expand abbreviations
-        normalized = self._expand_abbreviations(normalized)
+        prefix = self._prefix_re_for(merchant).match(normalized)
+        if prefix:
+            normalized = normalized[prefix.end():].strip()
 
-        # Clean up spacing and capitalization
-        normalized = self._clean_formatting(normalized)
+        # Expand abbreviations, clean up spacing and capitalization
+        normalized = self._expand_and_format(normalized)
 
         # Calculate confidence
         confidence = self._calculate_confidence(raw_text, normalized)
 
+        normalized = self._canonical_name(normalized)
+
         return NormalizedItem(
             original=raw_text,
             normalized=normalized,
@@ -244,10 +305,38 @@ class ItemNormalizer:
             method='rules'
         )
 
+    def _canonical_name(self, name: str) -> str:
+        """Return the shared string object equal to name"""
+        canonical = self._names.get(name)
+        if canonical is None:
+            if len(self._names) >= self._names_size:
+                del self._names[next(iter(self._names))]
+            canonical = self._names[name] = name
+        return canonical
+
+    @staticmethod
+    def _compile_prefixes(prefixes: List[str]) -> re.Pattern:
+        """Anchored alternation of brand prefixes, tried in list order"""
+        return re.compile('(?:' + '|'.join(re.escape(brand) for brand in prefixes) + ') ')
+
+    def _prefix_re_for(self, merchant: Optional[str]) -> re.Pattern:
+        """Brand prefix pattern specialized to the merchant, if it has one"""
+        if merchant:
+            upper_merchant = merchant.upper()
+            for name, pattern in self._merchant_prefix_res.items():
+                if name in upper_merchant:
+                    return pattern
+
+        return self._brand_prefix_re
+
     def _handle_brands(self, text: str) -> str:
         """Handle special brand products"""
         upper_text = text.upper()
 
+        # Most items mention no special brand at all
+        if not self._brand_product_re.search(upper_text):
+            return text
+
         # Check for special brand products
         for brand, rules in self.brand_products.items():
             if brand in upper_text:
@@ -264,57 +353,51 @@ class ItemNormalizer:
 
         return text
 
-    def _expand_abbreviations(self, text: str) -> str:
-        """Expand common abbreviations"""
-        import re
-        words = text.split()
-        expanded = []
-
-        for word in words:
-            lower_word = word.lower()
-
-            # Check if entire word is an abbreviation
-            if lower_word in self.abbreviations:
-                expanded.append(self.abbreviations[lower_word])
-            else:
-                # Check for partial matches (e.g., "2%MLK")
-                # Only expand if it's a word boundary match
-                expanded_word = word
-                for abbr, full in self.abbreviations.items():
-                    # Use word boundary regex to avoid partial matches in already-expanded words
-                    pattern = r'\b' + re.escape(abbr) + r'\b'
-                    if re.search(pattern, lower_word):
-                        expanded_word = re.sub(pattern, full, lower_word, flags=re.IGNORECASE)
-                        # Preserve original capitalization for the rest
-                        if word[0].isupper():
-                            expanded_word = expanded_word.capitalize()
-                        break  # Only expand the first match
-                expanded.append(expanded_word)
-
-        return ' '.join(expanded)
-
-    def _clean_formatting(self, text: str) -> str:
-        """Clean up formatting and capitalization"""
-        # Remove extra spaces
-        text = ' '.join(text.split())
-
-        # Title case but preserve certain words
-        words = text.split()
+    def _expand_and_format(self, text: str) -> str:
+        """Expand abbreviations and fix capitalization in one pass over the words"""
         formatted = []
 
-        for i, word in enumerate(words):
-            # Keep numbers as-is
-            if any(c.isdigit() for c in word):
-                formatted.append(word)
-            # First word or important word
-            elif i == 0 or len(word) > 2:
-                formatted.append(word.capitalize())
-            # Small words lowercase (unless at start)
-            else:
-                formatted.append(word.lower())
+        for word in text.split():
+            # Expansions like 'extra large' add words of their own
+            for part in self._expand_word(word).split():
+                # Keep numbers as-is
+                if HAS_DIGIT(part):
+                    formatted.append(part)
+                # First word or important word
+                elif not formatted or len(part) > 2:
+                    formatted.append(part.capitalize())
+                # Small words lowercase (unless at start)
+                else:
+                    formatted.append(part.lower())
 
         return ' '.join(formatted)
 
+    def _expand_word(self, word: str) -> str:
+        """Expand a common abbreviation in one word"""
+        lower_word = word.lower()
+
+        # Check if entire word is an abbreviation
+        full = self.abbreviations.get(lower_word)
+        if full is not None:
+            return full
+
+        # Check for partial matches (e.g., "2%MLK")
+        # Only expand if it's a word boundary match
+        matches = self._abbr_re.findall(lower_word)
+        if not matches:
+            return word
+
+        # Only expand the first abbreviation in dictionary order
+        abbr = min(matches, key=self._abbr_rank.__getitem__)
+        full = self.abbreviations[abbr]
+        expanded_word = self._abbr_re.sub(
+            lambda m: full if m.group() == abbr else m.group(), lower_word
+        )
+        # Preserve original capitalization for the rest
+        if word[0].isupper():
+            expanded_word = expanded_word.capitalize()
+        return expanded_word
+
     def _calculate_confidence(self, original: str, normalized: str) -> float:
         """Calculate confidence in normalization"""
         # High confidence if significant changes were made
@@ -347,7 +430,9 @@ class ItemNormalizer:
     def batch_normalize(self, items: List[str],
                         merchant: Optional[str] = None) -> List[NormalizedItem]:
         """Normalize multiple items"""
-        return [self.normalize(item, merchant) for item in items]
+        # Normalize each distinct item once and fan results back out
+        results = {item: self.normalize(item, merchant) for item in dict.fromkeys(items)}
+        return [results[item] for item in items]
 
 
 # Export singleton instance
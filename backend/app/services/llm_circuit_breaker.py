@@ -4,14 +4,17 @@ Circuit breaker for LLM calls with timeout and failure handling
 
 import asyncio
 import time
-from datetime import datetime, timedelta
 from enum import Enum
 from typing import Any, Callable, Dict, List, Optional
-from collections import deque
+from collections import OrderedDict, deque
 import logging
 
 logger = logging.getLogger(__name__)
 
+# asyncio.timeout (Python 3.11+) cancels the call in place instead of
+# wrapping it in a separate task like wait_for
+HAS_ASYNCIO_TIMEOUT = hasattr(asyncio, 'timeout')
+
 class CircuitState(Enum):
     """Circuit breaker states"""
     CLOSED = "closed"        # Normal operation
@@ -48,11 +51,23 @@ class LLMCircuitBreaker:
         self.min_calls = min_calls
         self.alert_callback = alert_callback
 
-        # Sliding window for tracking failures
-        self.call_history: deque = deque(maxlen=window_size)
-        self.last_failure_time: Optional[datetime] = None
+        # Sliding window for tracking failures, one deque per field:
+        # outcome, when it happened, and latency (success) or reason (failure)
+        # Times are time.monotonic() readings, immune to wall-clock jumps
+        self.call_outcomes: deque = deque(maxlen=window_size)
+        self.call_times: deque = deque(maxlen=window_size)
+        self.call_details: deque = deque(maxlen=window_size)
+        self.failures_in_window = 0
+        self.last_failure_time: Optional[float] = None
         self.consecutive_successes = 0
-        self.state_changed_at = datetime.now()
+        self.state_changed_at = time.monotonic()
+
+        # Bumped on every state change. Calls remember the version they
+        # were admitted under, so concurrent calls still in flight from
+        # before a trip can't close or re-open the recovering circuit.
+        # State checks and updates never await, so the event loop
+        # already serializes them and no lock is needed.
+        self.state_version = 0
 
         # Metrics
         self.total_calls = 0
@@ -92,17 +107,23 @@ class LLMCircuitBreaker:
                     "error": "LLM circuit breaker is open"
                 }
 
+        admitted_version = self.state_version
+
         try:
             # Call with timeout
-            start_time = time.time()
-            result = await asyncio.wait_for(
-                func(*args, **kwargs),
-                timeout=self.timeout
-            )
-            elapsed = time.time() - start_time
+            start_time = time.monotonic()
+            if HAS_ASYNCIO_TIMEOUT:
+                async with asyncio.timeout(self.timeout):
+                    result = await func(*args, **kwargs)
+            else:
+                result = await asyncio.wait_for(
+                    func(*args, **kwargs),
+                    timeout=self.timeout
+                )
+            elapsed = time.monotonic() - start_time
 
             # Record success
-            self._record_success(elapsed)
+            self._record_success(elapsed, admitted_version)
 
             return {
                 "source": "llm",
@@ -112,7 +133,7 @@ class LLMCircuitBreaker:
 
         except asyncio.TimeoutError:
             self.total_timeouts += 1
-            self._record_failure("timeout")
+            self._record_failure("timeout", admitted_version)
             logger.error(f"LLM call timeout after {self.timeout}s")
 
             return {
@@ -122,7 +143,7 @@ class LLMCircuitBreaker:
             }
 
         except Exception as e:
-            self._record_failure(str(e))
+            self._record_failure(str(e), admitted_version)
             logger.error(f"LLM call failed: {e}")
 
             return {
@@ -131,42 +152,35 @@ class LLMCircuitBreaker:
                 "error": str(e)
             }
 
-    def _record_success(self, latency: float):
+    def _record_success(self, latency: float, admitted_version: int):
         """Record successful call"""
-        self.call_history.append({
-            "success": True,
-            "timestamp": datetime.now(),
-            "latency": latency
-        })
+        self._append_call(True, latency)
 
-        if self.state == CircuitState.HALF_OPEN:
+        if self.state == CircuitState.HALF_OPEN and admitted_version == self.state_version:
             self.consecutive_successes += 1
             if self.consecutive_successes >= 3:  # Need 3 successes to close
                 logger.info("Circuit breaker recovering (CLOSED)")
                 self._transition_to(CircuitState.CLOSED)
                 self.consecutive_successes = 0
 
-    def _record_failure(self, reason: str):
+    def _record_failure(self, reason: str, admitted_version: int):
         """Record failed call and check if circuit should open"""
         self.total_failures += 1
-        self.last_failure_time = datetime.now()
+        self.last_failure_time = time.monotonic()
 
-        self.call_history.append({
-            "success": False,
-            "timestamp": datetime.now(),
-            "reason": reason
-        })
+        self._append_call(False, reason)
 
         # Reset consecutive successes
         self.consecutive_successes = 0
 
         # Check if we should open circuit
         if self.state == CircuitState.HALF_OPEN:
-            logger.warning("Circuit breaker tripping again (OPEN)")
-            self._transition_to(CircuitState.OPEN)
+            if admitted_version == self.state_version:
+                logger.warning("Circuit breaker tripping again (OPEN)")
+                self._transition_to(CircuitState.OPEN)
 
         elif self.state == CircuitState.CLOSED:
-            if len(self.call_history) >= self.min_calls:
+            if len(self.call_outcomes) >= self.min_calls:
                 failure_rate = self._calculate_failure_rate()
 
                 if failure_rate >= self.failure_threshold:
@@ -184,27 +198,39 @@ class LLMCircuitBreaker:
                             "reason": reason
                         })
 
+    def _append_call(self, success: bool, detail: Any):
+        """Add a call to the sliding window"""
+        # Keep the failure count in step with the outcome being evicted
+        outcomes = self.call_outcomes
+        if outcomes and len(outcomes) == outcomes.maxlen and not outcomes[0]:
+            self.failures_in_window -= 1
+        if not success:
+            self.failures_in_window += 1
+
+        outcomes.append(success)
+        self.call_times.append(time.monotonic())
+        self.call_details.append(detail)
+
     def _calculate_failure_rate(self) -> float:
         """Calculate failure rate in sliding window"""
-        if not self.call_history:
+        if not self.call_outcomes:
             return 0.0
 
-        failures = sum(1 for call in self.call_history if not call["success"])
-        return failures / len(self.call_history)
+        return self.failures_in_window / len(self.call_outcomes)
 
     def _should_attempt_reset(self) -> bool:
         """Check if enough time has passed to attempt recovery"""
         if not self.last_failure_time:
             return True
 
-        time_since_failure = datetime.now() - self.last_failure_time
-        return time_since_failure > timedelta(seconds=self.recovery_timeout)
+        return time.monotonic() - self.last_failure_time > self.recovery_timeout
 
     def _transition_to(self, new_state: CircuitState):
         """Transition to new state"""
         old_state = self.state
         self.state = new_state
-        self.state_changed_at = datetime.now()
+        self.state_changed_at = time.monotonic()
+        self.state_version += 1
 
         logger.info(f"Circuit breaker state change: {old_state.value} -> {new_state.value}")
 
@@ -213,23 +239,26 @@ class LLMCircuitBreaker:
         return {
             "state": self.state.value,
             "failure_rate": self._calculate_failure_rate(),
+            "failures_in_window": self.failures_in_window,
             "total_calls": self.total_calls,
             "total_failures": self.total_failures,
             "total_timeouts": self.total_timeouts,
             "circuit_opens": self.circuit_opens,
-            "state_duration_seconds": (
-                datetime.now() - self.state_changed_at
-            ).total_seconds(),
-            "window_size": len(self.call_history)
+            "state_duration_seconds": time.monotonic() - self.state_changed_at,
+            "window_size": len(self.call_outcomes)
         }
 
     def reset(self):
         """Manually reset circuit breaker"""
         logger.info("Circuit breaker manually reset")
         self.state = CircuitState.CLOSED
-        self.call_history.clear()
+        self.call_outcomes.clear()
+        self.call_times.clear()
+        self.call_details.clear()
+        self.failures_in_window = 0
         self.consecutive_successes = 0
-        self.state_changed_at = datetime.now()
+        self.state_changed_at = time.monotonic()
+        self.state_version += 1
 
     def force_open(self):
         """Manually open circuit (for testing/emergency)"""
@@ -241,8 +270,11 @@ class CircuitBreakerManager:
     Manages multiple circuit breakers for different services
     """
 
-    def __init__(self):
-        self.breakers: Dict[str, LLMCircuitBreaker] = {}
+    def __init__(self, max_breakers: int = 256):
+        # Least recently used breakers are dropped past max_breakers, so
+        # per-user or per-model names can't grow this without bound
+        self.breakers: OrderedDict = OrderedDict()
+        self.max_breakers = max_breakers
 
     def get_or_create(
         self,
@@ -250,10 +282,17 @@ class CircuitBreakerManager:
         **config
     ) -> LLMCircuitBreaker:
         """Get existing or create new circuit breaker"""
-        if name not in self.breakers:
-            self.breakers[name] = LLMCircuitBreaker(**config)
+        breaker = self.breakers.get(name)
+        if breaker is not None:
+            self.breakers.move_to_end(name)
+            return breaker
+
+        while len(self.breakers) >= self.max_breakers:
+            evicted, _ = self.breakers.popitem(last=False)
+            logger.warning(f"Evicting circuit breaker '{evicted}' (limit {self.max_breakers})")
 
-        return self.breakers[name]
+        breaker = self.breakers[name] = LLMCircuitBreaker(**config)
+        return breaker
 
     def get_all_status(self) -> Dict[str, Dict]:
         """Get status of all circuit breakers"""
@@ -35,22 +35,33 @@ class ReceiptHeuristics:
     def __init__(self):
         # Common merchant patterns
         self.merchant_patterns = [
-            r'^([A-Z][A-Z0-9\s&\-\.]{2,30})$',
-            r'^\s*([A-Z][A-Z\s]{2,20})\s+#?\d+\s*$',
-            r'STORE\s+#?(\d+)',
+            re.compile(pattern, re.IGNORECASE) for pattern in [
+                r'^([A-Z][A-Z0-9\s&\-\.]{2,30})$',
+                r'^\s*([A-Z][A-Z\s]{2,20})\s+#?\d+\s*$',
+                r'STORE\s+#?(\d+)',
+            ]
         ]
 
         # Date patterns
         self.date_patterns = [
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            r'(\d{2,4}[/-]\d{1,2}[/-]\d{1,2})',
-            r'([A-Z]{3}\s+\d{1,2},?\s+\d{4})',
-            r'(\d{1,2}\s+[A-Z]{3}\s+\d{4})',
+            re.compile(pattern) for pattern in [
+                r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+                r'(\d{2,4}[/-]\d{1,2}[/-]\d{1,2})',
+                r'([A-Z]{3}\s+\d{1,2},?\s+\d{4})',
+                r'(\d{1,2}\s+[A-Z]{3}\s+\d{4})',
+            ]
         ]
 
         # Price patterns
-        self.price_pattern = r'(\d{1,4}\.\d{2})'
-        self.negative_price_pattern = r'-\s*(\d{1,4}\.\d{2})'
+        self.price_pattern = re.compile(r'(\d{1,4}\.\d{2})')
+        self.negative_price_pattern = re.compile(r'-\s*(\d{1,4}\.\d{2})')
+
+        # Line item shapes
+        self.price_only_pattern = re.compile(r'^\d+\.\d{2}\s*[XO]?\s*$')  # Walmart "3.49 X"
+        self.barcode_pattern = re.compile(r'^\d{10,}$')
+        self.weight_pattern = re.compile(r'(\d+\.?\d*)\s*(LB|KG|OZ)\s*@\s*(\d+\.?\d*)')
+        self.register_code_pattern = re.compile(r'^ST#|^OP#|^TE#|^TR#')
+        self.phone_pattern = re.compile(r'^\(\s*\d+\s*\)')
 
         # Keywords to identify totals
         self.total_keywords = ['TOTAL', 'BALANCE', 'AMOUNT DUE', 'GRAND TOTAL']
@@ -59,17 +70,34 @@ class ReceiptHeuristics:
 
         # Skip patterns (not items)
         self.skip_patterns = [
-            r'TOTAL\s+POINTS',
-            r'REWARDS?\s+BALANCE',
-            r'MEMBER\s+#',
-            r'CARD\s+#',
-            r'^\*+$',
-            r'^-+$',
-            r'^=+$',
-            r'THANK\s+YOU',
-            r'RECEIPT',
-            r'CUSTOMER\s+COPY',
+            re.compile(pattern, re.IGNORECASE) for pattern in [
+                r'TOTAL\s+POINTS',
+                r'REWARDS?\s+BALANCE',
+                r'MEMBER\s+#',
+                r'CARD\s+#',
+                r'^\*+$',
+                r'^-+$',
+                r'^=+$',
+                r'THANK\s+YOU',
+                r'RECEIPT',
+                r'CUSTOMER\s+COPY',
+            ]
         ]
+        self.skip_pattern = re.compile(
+            '|'.join(f'(?:{pattern.pattern})' for pattern in self.skip_patterns),
+            re.IGNORECASE
+        )
+
+        # Lines mentioning any total/subtotal/tax keyword, matched against
+        # the uppercased line; most lines are items and fail this single scan
+        self.totals_skip_keywords = ['TOTAL POINTS', 'REWARDS', 'SAVED']
+        summary_keywords = self.total_keywords + self.subtotal_keywords + self.tax_keywords
+        self.summary_keyword_pattern = re.compile(
+            '|'.join(re.escape(keyword) for keyword in summary_keywords)
+        )
+        self.totals_keyword_pattern = re.compile(
+            '|'.join(re.escape(keyword) for keyword in self.totals_skip_keywords + summary_keywords)
+        )
 
     async def process(self, ocr_data: Dict) -> Dict:
         """
@@ -83,35 +111,46 @@ class ReceiptHeuristics:
         """
         # Extract text lines
         lines = self._extract_lines(ocr_data)
+        upper_lines = [line.upper() for line in lines]  # For keyword checks
 
         # Extract metadata
         merchant = self._find_merchant(lines[:5])  # Check first 5 lines
         date = self._find_date(lines)
 
         # Find totals
-        totals = self._find_totals(lines)
+        totals = self._find_totals(lines, upper_lines)
         total = totals.get('total')
         subtotal = totals.get('subtotal')
         tax = totals.get('tax')
 
         # Parse line items
-        item_lines = self._parse_line_items(lines)
+        item_lines = self._parse_line_items(lines, upper_lines)
+
+        # Price statistics shared by the scoring helpers, in one pass.
+        # Parsed prices are never negative, so "priced" means > 0.
+        items_with_price = 0
+        item_sum = 0
+        for item in item_lines:
+            price = item.get('price', 0)
+            item_sum += price
+            if price > 0:
+                items_with_price += 1
 
         # Calculate confidence
         confidence = self._calculate_confidence(
-            merchant, date, total, item_lines
+            merchant, date, total, items_with_price
         )
 
         # Check reconciliation
         reconciliation_ok = self._check_reconciliation(
-            item_lines, subtotal, tax, total
+            len(item_lines), item_sum, subtotal, tax, total
         )
 
         # Determine if we can skip LLM
-        lines_paired_ratio = self._calculate_pairing_ratio(item_lines)
+        lines_paired_ratio = self._calculate_pairing_ratio(items_with_price, len(item_lines))
         should_skip_llm = self._should_skip_llm(
             merchant, date, total, lines_paired_ratio,
-            reconciliation_ok, confidence, item_lines
+            reconciliation_ok, confidence, items_with_price
         )
 
         return {
@@ -131,28 +170,40 @@ class ReceiptHeuristics:
         """Extract text lines from OCR data"""
         # Handle string input (raw OCR text)
         if isinstance(ocr_data, str):
-            return [line.strip() for line in ocr_data.split('\n') if line.strip()]
+            full_text = ocr_data
 
         # Handle dict input (structured OCR response)
-        if isinstance(ocr_data, dict):
+        elif isinstance(ocr_data, dict):
             if 'text_annotations' in ocr_data and ocr_data['text_annotations']:
                 full_text = ocr_data['text_annotations'][0].get('description', '')
-                return [line.strip() for line in full_text.split('\n') if line.strip()]
             elif 'text' in ocr_data:
-                return [line.strip() for line in ocr_data['text'].split('\n') if line.strip()]
+                full_text = ocr_data['text']
+            else:
+                return []
+
+        else:
+            return []
 
-        return []
+        # Strip each line once, dropping blank ones
+        return [line for line in map(str.strip, full_text.split('\n')) if line]
 
     def _find_merchant(self, lines: List[str]) -> Optional[str]:
         """Find merchant name in first few lines"""
         for line in lines:
+            # Simple heuristic: first all-caps line without numbers.
+            # Checked first as it's cheapest; a merchant pattern can only
+            # match such a line with the same result.
+            if (line.isupper() and 3 <= len(line) <= 30 and
+                    not any(char.isdigit() for char in line)):
+                return line
+
             # Skip if line has prices (not likely merchant)
-            if re.search(self.price_pattern, line):
+            if self.price_pattern.search(line):
                 continue
 
             # Check merchant patterns
             for pattern in self.merchant_patterns:
-                match = re.match(pattern, line, re.IGNORECASE)
+                match = pattern.match(line)
                 if match:
                     merchant = match.group(1) if match.groups() else line
                     # Clean up merchant name
@@ -160,18 +211,13 @@ class ReceiptHeuristics:
                     if len(merchant) >= 3:
                         return merchant
 
-            # Simple heuristic: first all-caps line without numbers
-            if line.isupper() and not any(char.isdigit() for char in line):
-                if len(line) >= 3 and len(line) <= 30:
-                    return line
-
         return None
 
     def _find_date(self, lines: List[str]) -> Optional[str]:
         """Find date in receipt"""
         for line in lines:
             for pattern in self.date_patterns:
-                match = re.search(pattern, line)
+                match = pattern.search(line)
                 if match:
                     date_str = match.group(1)
                     # Try to normalize date
@@ -182,7 +228,11 @@ class ReceiptHeuristics:
                         return date_str
         return None
 
-    def _find_totals(self, lines: List[str]) -> Dict[str, Optional[float]]:
+    def _find_totals(
+        self,
+        lines: List[str],
+        upper_lines: List[str]
+    ) -> Dict[str, Optional[float]]:
         """Find total, subtotal, and tax amounts"""
         result = {
             'total': None,
@@ -190,11 +240,12 @@ class ReceiptHeuristics:
             'tax': None
         }
 
-        for i, line in enumerate(lines):
-            line_upper = line.upper()
+        for line, line_upper in zip(lines, upper_lines):
+            if not self.totals_keyword_pattern.search(line_upper):
+                continue
 
             # Skip "TOTAL POINTS" and similar
-            if any(skip in line_upper for skip in ['TOTAL POINTS', 'REWARDS', 'SAVED']):
+            if any(skip in line_upper for skip in self.totals_skip_keywords):
                 continue
 
             # Check for total
@@ -220,7 +271,7 @@ class ReceiptHeuristics:
     def _extract_price_from_line(self, line: str) -> Optional[float]:
         """Extract price from a line"""
         # Look for price pattern
-        matches = re.findall(self.price_pattern, line)
+        matches = self.price_pattern.findall(line)
         if matches:
             # Return the last price found (usually the actual price)
             try:
@@ -229,27 +280,27 @@ class ReceiptHeuristics:
                 pass
         return None
 
-    def _parse_line_items(self, lines: List[str]) -> List[Dict]:
+    def _parse_line_items(self, lines: List[str], upper_lines: List[str]) -> List[Dict]:
         """Parse line items from receipt"""
         items = []
         pending_item = None  # For multi-line items (Walmart style)
 
-        for i, line in enumerate(lines):
+        for line, line_upper in zip(lines, upper_lines):
             # Skip if matches skip patterns
-            if any(re.search(pattern, line, re.IGNORECASE) for pattern in self.skip_patterns):
+            if self.skip_pattern.search(line):
                 continue
 
             # Skip lines with total/subtotal/tax keywords
-            line_upper = line.upper()
-            if any(keyword in line_upper for keyword in
-                   self.total_keywords + self.subtotal_keywords + self.tax_keywords):
+            if self.summary_keyword_pattern.search(line_upper):
                 continue
 
-            # Look for price in line
-            price = self._extract_price_from_line(line)
+            # Look for price in line. One scan finds every price: the last
+            # is the item's price, the first ends the item text.
+            price_matches = list(self.price_pattern.finditer(line))
+            price = float(price_matches[-1].group(1)) if price_matches else None
 
             # Handle Walmart format: price on separate line with X or O
-            if re.match(r'^\d+\.\d{2}\s*[XO]?\s*$', line.strip()):
+            if self.price_only_pattern.match(line.strip()):
                 # This is a price-only line
                 if pending_item and price:
                     # Attach price to previous item
@@ -260,43 +311,41 @@ class ReceiptHeuristics:
                 continue
 
             # Skip lines that are just numbers (barcodes)
-            if re.match(r'^\d{10,}$', line.strip()):
+            if self.barcode_pattern.match(line.strip()):
                 continue
 
             if price and price > 0:
                 # Standard format: item and price on same line
-                price_match = re.search(self.price_pattern, line)
-                if price_match:
-                    item_text = line[:price_match.start()].strip()
+                item_text = line[:price_matches[0].start()].strip()
 
-                    # Skip if item text is too short or just numbers
-                    if len(item_text) < 2 or item_text.isdigit():
-                        continue
+                # Skip if item text is too short or just numbers
+                if len(item_text) < 2 or item_text.isdigit():
+                    continue
 
-                    # Check for weighted item (e.g., "2.45 LB @ 3.54/LB")
-                    weight_match = re.search(r'(\d+\.?\d*)\s*(LB|KG|OZ)\s*@\s*(\d+\.?\d*)', line)
+                # Check for weighted item (e.g., "2.45 LB @ 3.54/LB")
+                weight_match = self.weight_pattern.search(line)
 
-                    item = {
-                        'raw_text': line,
-                        'item': item_text,
-                        'price': price,
-                        'qty': 1.0,
-                        'unit': 'piece'
-                    }
+                item = {
+                    'raw_text': line,
+                    'item': item_text,
+                    'price': price,
+                    'qty': 1.0,
+                    'unit': 'piece'
+                }
 
-                    if weight_match:
-                        item['qty'] = float(weight_match.group(1))
-                        item['unit'] = weight_match.group(2).lower()
-                        item['price_per_unit'] = float(weight_match.group(3))
+                if weight_match:
+                    item['qty'] = float(weight_match.group(1))
+                    item['unit'] = weight_match.group(2).lower()
+                    item['price_per_unit'] = float(weight_match.group(3))
 
-                    items.append(item)
+                items.append(item)
             else:
                 # No price on this line - might be item name (Walmart style)
                 # Check if it looks like a product name
                 if (len(line) > 2 and
                     not line.isdigit() and
-                    not re.match(r'^ST#|^OP#|^TE#|^TR#', line) and
-                    not re.match(r'^\(\s*\d+\s*\)', line)):  # Not phone number
+                    not self.register_code_pattern.match(line) and
+                    not self.phone_pattern.match(line)):  # Not phone number
 
                     # Save as pending item
                     pending_item = {
@@ -314,7 +363,7 @@ class ReceiptHeuristics:
         merchant: Optional[str],
         date: Optional[str],
         total: Optional[float],
-        items: List[Dict]
+        items_with_price: int
     ) -> float:
         """Calculate overall confidence score"""
         confidence = 0.0
@@ -328,8 +377,6 @@ class ReceiptHeuristics:
             confidence += 0.05
 
         # Item parsing quality (70% total - most important!)
-        items_with_price = sum(1 for item in items if item.get('price', 0) > 0)
-
         if items_with_price > 0:
             # Base points for having any items
             confidence += 0.20
@@ -351,18 +398,16 @@ class ReceiptHeuristics:
 
     def _check_reconciliation(
         self,
-        items: List[Dict],
+        item_count: int,
+        item_sum: float,
         subtotal: Optional[float],
         tax: Optional[float],
         total: Optional[float]
     ) -> bool:
         """Check if amounts reconcile within tolerance"""
-        if not items or not total:
+        if not item_count or not total:
             return False
 
-        # Sum item prices
-        item_sum = sum(item.get('price', 0) for item in items)
-
         # If we have subtotal, check against items
         if subtotal:
             tolerance = max(0.05, subtotal * 0.02)  # 5¢ or 2%
@@ -383,13 +428,12 @@ class ReceiptHeuristics:
 
         return abs(estimated_total - total) <= tolerance
 
-    def _calculate_pairing_ratio(self, items: List[Dict]) -> float:
+    def _calculate_pairing_ratio(self, items_with_price: int, item_count: int) -> float:
         """Calculate ratio of items with prices"""
-        if not items:
+        if not item_count:
             return 0.0
 
-        items_with_price = sum(1 for item in items if item.get('price'))
-        return items_with_price / len(items)
+        return items_with_price / item_count
 
     def _should_skip_llm(
         self,
@@ -399,12 +443,9 @@ class ReceiptHeuristics:
         lines_paired_ratio: float,
         reconciliation_ok: bool,
         confidence: float,
-        items: List[Dict]
+        items_with_price: int
     ) -> bool:
         """Determine if LLM can be skipped"""
-        # Count items with prices
-        items_with_price = sum(1 for item in items if item.get('price', 0) > 0)
-
         # Require minimum viable parsing to skip LLM
         return (
             merchant is not None and
@@ -414,4 +455,4 @@ class ReceiptHeuristics:
             lines_paired_ratio >= 0.70 and
             reconciliation_ok and
             confidence >= 0.7  # Lower threshold since confidence is now more accurate
-        )
\ No newline at end of file
+        )
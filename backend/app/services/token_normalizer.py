@@ -4,17 +4,42 @@ Handles abbreviations, brand removal, and size normalizations
 """
 
 import re
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Set, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Special characters (anything but word characters, whitespace and
+# hyphens) become spaces. ASCII text goes through a byte translation
+# table, which is far cheaper than the regex it stands in for.
+SPECIAL_CHAR_PATTERN = re.compile(r'[^\w\s\-]')
+SPECIAL_CHAR_TABLE = bytes(
+    byte if byte < 128 and not SPECIAL_CHAR_PATTERN.match(chr(byte)) else ord(' ')
+    for byte in range(256)
+)
+
+# Letters OCR commonly confuses with digits, as regex character classes
+OCR_CHAR_CLASSES = str.maketrans({
+    'O': '[O0]',
+    'I': '[I1]',
+    'S': '[S5]',
+    'E': '[E3]'
+})
+
+# Common/non-distinctive words left out of key tokens
+STOPWORDS = frozenset({
+    'THE', 'A', 'AN', 'OF', 'WITH', 'IN', 'ON', 'FOR',
+    'AND', 'OR', 'BUT', 'TO', 'FROM', 'BY', 'AS', 'IS'
+})
+
 class TokenNormalizer:
     """
     Normalizes receipt text tokens for better alias matching
     """
 
-    def __init__(self):
+    def __init__(self, cache_size: int = 4096):
         # Common abbreviation expansions
         self.abbreviations = {
             # Dairy
@@ -46,7 +71,7 @@ class TokenNormalizer:
             'POT': ['POTATO', 'POTATOES'],
             'BAN': ['BANANA', 'BANANAS'],
             'APP': ['APPLE', 'APPLES'],
-            'ORG': ['ORANGE', 'ORANGES'],
+            'ORNG': ['ORANGE', 'ORANGES'],  # ORG is organic, below
             'CARR': ['CARROT', 'CARROTS'],
             'BROC': ['BROCCOLI'],
 
@@ -102,18 +127,47 @@ class TokenNormalizer:
             'TYSON', 'PERDUE', 'HORMEL', 'OSCAR MAYER', 'HILLSHIRE',
             'BARILLA', 'RONZONI', 'MUELLER', 'BIRDSEYE', 'GREEN GIANT'
         }
+        # Single-word brands are dropped per token; multi-word ones are
+        # removed from the joined text in one scan
+        self._multi_word_brand_pattern = re.compile('|'.join(
+            re.escape(brand) for brand in sorted(
+                (brand for brand in self.brand_stopwords if ' ' in brand),
+                key=lambda brand: (-len(brand), brand)
+            )
+        ))
+
+        # Size modifiers to normalize ("2GAL" -> "2 GALLON", "FL OZ")
+        self.size_units = {
+            'GAL': 'GALLON',
+            'QT': 'QUART',
+            'PT': 'PINT',
+            'LB': 'POUND',
+            'OZ': 'OUNCE',
+            'PK': 'PACK',
+            'CT': 'COUNT'
+        }
+        # Each unit is a named group, so the match says which one it was
+        self._size_pattern = re.compile(
+            r'\b(\d+)\s*(?:' + '|'.join(f'(?P<{unit}>{unit})' for unit in self.size_units) +
+            r')\b|\bFL\s+OZ\b',
+            re.IGNORECASE
+        )
+
+        # Abbreviation -> primary (first) expansion, used when normalizing
+        self._primary_expansions: Dict[str, str] = {
+            abbrev: expansions[0] for abbrev, expansions in self.abbreviations.items()
+        }
 
-        # Size modifiers to normalize
-        self.size_patterns = [
-            (r'\b(\d+)\s*GAL\b', r'\1 GALLON'),
-            (r'\b(\d+)\s*QT\b', r'\1 QUART'),
-            (r'\b(\d+)\s*PT\b', r'\1 PINT'),
-            (r'\b(\d+)\s*LB\b', r'\1 POUND'),
-            (r'\b(\d+)\s*OZ\b', r'\1 OUNCE'),
-            (r'\bFL\s+OZ\b', 'FLUID OUNCE'),
-            (r'\b(\d+)\s*PK\b', r'\1 PACK'),
-            (r'\b(\d+)\s*CT\b', r'\1 COUNT')
-        ]
+        # Expanded word -> first abbreviation listing it, for variants
+        self._expansion_to_abbreviation: Dict[str, str] = {}
+        for abbrev, expansions in self.abbreviations.items():
+            for expansion in expansions:
+                self._expansion_to_abbreviation.setdefault(expansion, abbrev)
+
+        # Whole whitespace-separated tokens that are abbreviations
+        self._abbreviation_pattern = re.compile(
+            r'(?<!\S)(?:' + '|'.join(map(re.escape, self.abbreviations)) + r')(?!\S)'
+        )
 
         # Common typos and OCR errors
         self.ocr_corrections = {
@@ -130,6 +184,18 @@ class TokenNormalizer:
             'CHEE5E': 'CHEESE',
             'CH33SE': 'CHEESE'
         }
+        self._ocr_pattern = re.compile('|'.join(
+            re.escape(typo)
+            for typo in sorted(self.ocr_corrections, key=len, reverse=True)
+        ))
+
+        # Variants, key tokens and similarity all re-normalize the same
+        # receipt and alias strings, so keep recent results
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = cache_size
+        # Shared instances are called from the event loop and from worker
+        # threads at once; reordering and evicting must not interleave
+        self._cache_lock = threading.Lock()
 
     def normalize(self, text: str) -> str:
         """
@@ -138,11 +204,30 @@ class TokenNormalizer:
         if not text:
             return ""
 
+        with self._cache_lock:
+            normalized = self._cache.get(text)
+            if normalized is not None:
+                self._cache.move_to_end(text)
+                return normalized
+
+        normalized = self._normalize(text)
+
+        with self._cache_lock:
+            while len(self._cache) >= self._cache_size:
+                self._cache.popitem(last=False)
+            self._cache[text] = normalized
+        return normalized
+
+    def _normalize(self, text: str) -> str:
+        """Normalization pipeline without the cache"""
         # Start with uppercase
         normalized = text.upper().strip()
 
         # Remove special characters except spaces and hyphens
-        normalized = re.sub(r'[^\w\s\-]', ' ', normalized)
+        if normalized.isascii():
+            normalized = normalized.encode('ascii').translate(SPECIAL_CHAR_TABLE).decode('ascii')
+        else:
+            normalized = SPECIAL_CHAR_PATTERN.sub(' ', normalized)
 
         # Apply OCR corrections
         normalized = self._apply_ocr_corrections(normalized)
@@ -163,48 +248,34 @@ class TokenNormalizer:
 
     def _apply_ocr_corrections(self, text: str) -> str:
         """Apply common OCR error corrections"""
-        for typo, correction in self.ocr_corrections.items():
-            text = text.replace(typo, correction)
-        return text
+        return self._ocr_pattern.sub(lambda m: self.ocr_corrections[m.group()], text)
 
     def _expand_abbreviations(self, text: str) -> str:
         """Expand known abbreviations"""
-        tokens = text.split()
-        expanded = []
-
-        for token in tokens:
-            # Check if token is an abbreviation
-            if token in self.abbreviations:
-                # Use first expansion as primary
-                expanded.append(self.abbreviations[token][0])
-            else:
-                expanded.append(token)
-
-        return ' '.join(expanded)
+        # Use first expansion as primary
+        return self._abbreviation_pattern.sub(
+            lambda m: self._primary_expansions[m.group()], text
+        )
 
     def _normalize_sizes(self, text: str) -> str:
         """Normalize size patterns"""
-        for pattern, replacement in self.size_patterns:
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-        return text
+        return self._size_pattern.sub(self._replace_size, text)
+
+    def _replace_size(self, match: re.Match) -> str:
+        """Spell out the unit of one size match"""
+        if match.lastgroup is None:
+            return 'FLUID OUNCE'
+        return f"{match.group(1)} {self.size_units[match.lastgroup]}"
 
     def _remove_brands(self, text: str) -> str:
         """Remove brand names"""
-        tokens = text.split()
-
         # Filter out individual brand tokens
-        filtered = []
-        for token in tokens:
-            if token not in self.brand_stopwords:
-                filtered.append(token)
+        result = ' '.join(
+            token for token in text.split() if token not in self.brand_stopwords
+        )
 
         # Also check for multi-word brands
-        result = ' '.join(filtered)
-        for brand in self.brand_stopwords:
-            if ' ' in brand:  # Multi-word brand
-                result = result.replace(brand, '')
-
-        return result.strip()
+        return self._multi_word_brand_pattern.sub('', result).strip()
 
     def generate_variants(self, text: str) -> List[str]:
         """
@@ -226,16 +297,7 @@ class TokenNormalizer:
         tokens = normalized.split()
 
         # Try reversing expansions (find abbreviations for expanded words)
-        abbreviated = []
-        for token in tokens:
-            found_abbrev = False
-            for abbrev, expansions in self.abbreviations.items():
-                if token in expansions:
-                    abbreviated.append(abbrev)
-                    found_abbrev = True
-                    break
-            if not found_abbrev:
-                abbreviated.append(token)
+        abbreviated = [self._expansion_to_abbreviation.get(token, token) for token in tokens]
 
         if abbreviated != tokens:
             variants.add(' '.join(abbreviated))
@@ -254,22 +316,13 @@ class TokenNormalizer:
         Returns list of significant tokens
         """
         normalized = self.normalize(text)
-        tokens = normalized.split()
 
-        # Filter out very common/non-distinctive words
-        stopwords = {
-            'THE', 'A', 'AN', 'OF', 'WITH', 'IN', 'ON', 'FOR',
-            'AND', 'OR', 'BUT', 'TO', 'FROM', 'BY', 'AS', 'IS'
-        }
-
-        # Keep tokens that are likely ingredient indicators
-        key_tokens = []
-        for token in tokens:
-            # Skip stopwords and very short tokens
-            if token not in stopwords and len(token) > 2:
-                key_tokens.append(token)
-
-        return key_tokens
+        # Keep tokens that are likely ingredient indicators,
+        # skipping stopwords and very short tokens
+        return [
+            token for token in normalized.split()
+            if token not in STOPWORDS and len(token) > 2
+        ]
 
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """
@@ -300,15 +353,8 @@ class TokenNormalizer:
         tokens = normalized.split()
 
         # Build pattern with optional spaces and word boundaries
-        pattern_parts = []
-        for token in tokens:
-            # Allow for OCR variations (0/O, 1/I, etc.)
-            token_pattern = token
-            token_pattern = token_pattern.replace('O', '[O0]')
-            token_pattern = token_pattern.replace('I', '[I1]')
-            token_pattern = token_pattern.replace('S', '[S5]')
-            token_pattern = token_pattern.replace('E', '[E3]')
-            pattern_parts.append(token_pattern)
+        # Allow for OCR variations (0/O, 1/I, etc.)
+        pattern_parts = [token.translate(OCR_CHAR_CLASSES) for token in tokens]
 
         # Join with flexible spacing
         pattern = r'\s*'.join(pattern_parts)
@@ -70,6 +70,23 @@ class PIIRedactor:
             ],
         }
 
+        # Compile everything once; cashier names match case-insensitively
+        self.compiled_patterns = {
+            pii_type: [
+                re.compile(pattern, re.IGNORECASE if pii_type == 'cashier_name' else 0)
+                for pattern in patterns
+            ]
+            for pii_type, patterns in self.patterns.items()
+        }
+
+        # Cheap single-pass check: every pattern above needs one of these
+        # (an @, a 4+ digit run, a dotted IP, a DL prefix or a cashier
+        # keyword), so text without any cannot contain pattern PII.
+        # Keep in sync when adding patterns.
+        self.candidate_pattern = re.compile(
+            r'@|\d{4}|\d\.\d{1,3}\.\d|DL|(?i:CASHIER|ASSOCIATE|SERVED BY|YOUR SERVER)'
+        )
+
         # Replacement strings
         self.replacements = {
             'card_number': '[CARD]',
@@ -93,6 +110,9 @@ class PIIRedactor:
             r'^\d+\s+[A-Z\s]+RD|ROAD',
             r'^P\.?O\.?\s*BOX',  # PO Box
         ]
+        self.compiled_remove_patterns = [
+            re.compile(pattern, re.IGNORECASE) for pattern in self.remove_patterns
+        ]
 
     def redact(self, text: str, preserve_structure: bool = True) -> str:
         """
@@ -107,16 +127,13 @@ class PIIRedactor:
         """
         redacted = text
 
-        # Apply pattern replacements
-        for pii_type, patterns in self.patterns.items():
-            replacement = self.replacements.get(pii_type, '[REDACTED]')
+        # Apply pattern replacements; skipped when nothing could match
+        if self.has_candidates(text):
+            for pii_type, patterns in self.compiled_patterns.items():
+                replacement = self.replacements.get(pii_type, '[REDACTED]')
 
-            for pattern in patterns:
-                # Special handling for cashier names
-                if pii_type == 'cashier_name':
-                    redacted = re.sub(pattern, replacement, redacted, flags=re.IGNORECASE)
-                else:
-                    redacted = re.sub(pattern, replacement, redacted)
+                for pattern in patterns:
+                    redacted = pattern.sub(replacement, redacted)
 
         if preserve_structure:
             # Process line by line for removals
@@ -126,8 +143,9 @@ class PIIRedactor:
             for line in lines:
                 # Check if line should be removed
                 should_remove = False
-                for pattern in self.remove_patterns:
-                    if re.match(pattern, line.strip(), re.IGNORECASE):
+                stripped = line.strip()
+                for pattern in self.compiled_remove_patterns:
+                    if pattern.match(stripped):
                         should_remove = True
                         break
 
@@ -153,12 +171,14 @@ class PIIRedactor:
         """
         detected = {}
 
-        for pii_type, patterns in self.patterns.items():
+        if not self.has_candidates(text):
+            return detected
+
+        for pii_type, patterns in self.compiled_patterns.items():
             matches = []
 
             for pattern in patterns:
-                found = re.findall(pattern, text, re.IGNORECASE if pii_type == 'cashier_name' else 0)
-                matches.extend(found)
+                matches.extend(pattern.findall(text))
 
             if matches:
                 # Only store first 3 examples (redacted)
@@ -168,6 +188,10 @@ class PIIRedactor:
 
         return detected
 
+    def has_candidates(self, text: str) -> bool:
+        """Whether text could contain pattern PII at all"""
+        return self.candidate_pattern.search(text) is not None
+
     def _partial_redact(self, value: str) -> str:
         """
         Partially redact a value for logging
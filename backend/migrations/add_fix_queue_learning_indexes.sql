@@ -0,0 +1,14 @@
+-- Partial indexes for automation rule suggestions
+-- Run after update_fix_queue.sql
+-- CONCURRENTLY cannot run inside a transaction block; apply this file on its own.
+
+-- Name mappings: predicate must match suggest_automation_rules word-for-word
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_fix_queue_learn_names
+    ON fix_queue(raw_text, parsed_name, corrected_name, category)
+    INCLUDE (household_id)
+    WHERE resolved = true AND corrected_name IS NOT NULL AND raw_text <> corrected_name;
+
+-- Category mappings
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_fix_queue_learn_categories
+    ON fix_queue(corrected_name, category)
+    WHERE resolved = true AND category IS NOT NULL;
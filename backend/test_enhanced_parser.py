@@ -282,5 +282,62 @@ async def test_parser():
     return results
 
 
+async def test_total_line_types():
+    """Lines like "TOTAL TAX" count as tax, not as the receipt total"""
+    parser = EnhancedHeuristicParser()
+    result = await parser.parse(
+        """
+        SUBTOTAL            6.48
+        TOTAL TAX           0.52
+        TOTAL               7.00
+        """
+    )
+
+    assert result.subtotal_cents == 648, result.subtotal_cents
+    assert result.tax_cents == 52, result.tax_cents
+    assert result.total_cents == 700, result.total_cents
+    print("✅ TOTAL TAX line classified as tax")
+
+    # Totals that mention the tax they include are still the receipt total
+    for total_line in ("TOTAL AFTER TAX     4.51", "TOTAL INCL HST      4.51"):
+        result = await parser.parse(
+            f"""
+            SUBTOTAL            3.99
+            HST                 0.52
+            {total_line}
+            """
+        )
+
+        assert result.tax_cents == 52, (total_line, result.tax_cents)
+        assert result.total_cents == 451, (total_line, result.total_cents)
+        print(f"✅ {total_line.split('  ')[0]} line classified as total")
+
+
+def test_date_formats():
+    """Receipt dates in every supported layout come out as YYYY-MM-DD"""
+    parser = EnhancedHeuristicParser()
+    cases = {
+        "2024-01-15": "2024-01-15",          # ISO, not read as month 24
+        "2024.01.15": "2024-01-15",          # Dotted ISO
+        "01/15/2024 14:32": "2024-01-15",
+        "01/15/24": "2024-01-15",
+        "Jan 15, 2024": "2024-01-15",
+        "JAN. 15 2024": "2024-01-15",
+        "SEPT 5, 2024": "2024-09-05",
+        "JANUARY 15, 2024": "2024-01-15",
+        "DECEMBER 1, 2023": "2023-12-01",
+        "15 JAN 2024": "2024-01-15",
+        "1 September 2024": "2024-09-01",
+        "MARKET 12, 2024": None,
+    }
+
+    for line, expected in cases.items():
+        date = parser._match_date(line)
+        assert date == expected, (line, date, expected)
+    print(f"✅ {len(cases)} date formats normalized")
+
+
 if __name__ == "__main__":
+    test_date_formats()
+    asyncio.run(test_total_line_types())
     results = asyncio.run(test_parser())
\ No newline at end of file
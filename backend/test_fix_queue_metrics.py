@@ -0,0 +1,69 @@
+"""
+Test script for the correction metrics write-behind buffer
+Run: python test_fix_queue_metrics.py
+
+Uses an in-memory pool, so no database is needed.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from app.services.fix_queue_learning import FixQueueLearningService, METRICS_COLUMNS
+
+
+class FakeConnection:
+    """Records COPYs instead of writing them"""
+
+    def __init__(self):
+        self.copies = []
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.copies.append((table, list(records), columns))
+
+
+class FakePool:
+    """Hands out one shared FakeConnection"""
+
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+async def test_close_flushes_buffered_metrics():
+    """Rows queued by _enqueue_metrics are written by close()"""
+    service = FixQueueLearningService()
+    pool = FakePool()
+    service._pool = pool
+
+    now = datetime.now(timezone.utc)
+    rows = [
+        ('household-1', 'KROGER', f'receipt-{i}', ['price'], now)
+        for i in range(5)
+    ]
+    service._enqueue_metrics(rows[:3])
+    service._enqueue_metrics(rows[3:])
+
+    # close() must not wait out METRICS_FLUSH_INTERVAL
+    await asyncio.wait_for(service.close(), timeout=1.0)
+
+    written = [row for _, records, _ in pool.conn.copies for row in records]
+    assert written == rows, written
+    assert all(table == 'correction_metrics' for table, _, _ in pool.conn.copies)
+    assert all(columns == METRICS_COLUMNS for _, _, columns in pool.conn.copies)
+    assert service._metrics_flusher is None
+    assert service._metrics_queue.empty()
+    print(f"✅ close() flushed {len(written)} buffered rows in {len(pool.conn.copies)} COPY(s)")
+
+    # Closing again is a no-op
+    copies = len(pool.conn.copies)
+    await service.close()
+    assert len(pool.conn.copies) == copies
+    print("✅ second close() wrote nothing new")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_close_flushes_buffered_metrics())